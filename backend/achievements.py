@@ -0,0 +1,94 @@
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, NamedTuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+
+class AchievementRule(NamedTuple):
+    name: str
+    metric: str
+    threshold: int
+
+
+# Unlocked when game[metric] >= threshold
+ACHIEVEMENT_RULES = [
+    AchievementRule("İlk Vuruş", "score", 1),
+    AchievementRule("10 Vuruş", "score", 10),
+    AchievementRule("50 Vuruş", "score", 50),
+    AchievementRule("100 Vuruş", "score", 100),
+    AchievementRule("Kombo Ustası", "score", 200),
+]
+
+
+def earned(game: dict) -> List[str]:
+    return [
+        rule.name for rule in ACHIEVEMENT_RULES
+        if game.get(rule.metric, 0) >= rule.threshold
+    ]
+
+
+async def remove_duplicates(db) -> int:
+    pipeline = [
+        {"$sort": {"unlocked_at": 1}},
+        {"$group": {
+            "_id": {"user_id": "$user_id", "achievement_name": "$achievement_name"},
+            "ids": {"$push": "$_id"},
+        }},
+        {"$match": {"ids.1": {"$exists": True}}},
+    ]
+    extra = []
+    async for group in db.achievements.aggregate(pipeline, allowDiskUse=True):
+        extra.extend(group["ids"][1:])
+    if not extra:
+        return 0
+    result = await db.achievements.delete_many({"_id": {"$in": extra}})
+    return result.deleted_count
+
+
+async def unlock(db, earned_by_user: Dict[str, Iterable[str]]) -> Dict[str, List[dict]]:
+    """Persist earned achievements in one bulk_write, returning the new ones per user.
+
+    Each achievement is an upsert on the unique (user_id, achievement_name)
+    index, so already-unlocked ones are no-ops and concurrent saves can't
+    create duplicates.
+    """
+    unlocked_at = datetime.now(timezone.utc).isoformat()
+    ops = []
+    docs = []
+    for user_id, names in earned_by_user.items():
+        for name in names:
+            doc = {
+                "id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "achievement_name": name,
+                "unlocked_at": unlocked_at
+            }
+            ops.append(UpdateOne(
+                {"user_id": user_id, "achievement_name": name},
+                {"$setOnInsert": doc},
+                upsert=True
+            ))
+            docs.append(doc)
+
+    new: Dict[str, List[dict]] = {user_id: [] for user_id in earned_by_user}
+    if not ops:
+        return new
+    try:
+        result = await db.achievements.bulk_write(ops, ordered=False)
+        upserted = list(result.upserted_ids)
+    except BulkWriteError as e:
+        # Some upserts lost a race with a concurrent save (duplicate key);
+        # whoever won reports those, the rest still went through
+        if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+            raise
+        upserted = [entry["index"] for entry in e.details.get("upserted", [])]
+    for index in upserted:
+        doc = docs[index]
+        new[doc["user_id"]].append(doc)
+    return new
+
+
+async def check_achievements(db, user_id: str, game: dict) -> List[dict]:
+    return (await unlock(db, {user_id: earned(game)}))[user_id]
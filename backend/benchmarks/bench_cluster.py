@@ -0,0 +1,110 @@
+"""Room event throughput with 1..N worker processes sharing rooms.
+
+Every worker imports server.py with SOCKETIO_MESSAGE_QUEUE=local, wired to a
+multiprocessing ProcessBroker and a shared room directory. Worker i creates
+its rooms. With placement "split" (default) worker i+1 joins them, so every
+match has one local and one remote player whose events are forwarded to the
+owning worker; with "local" both players sit on the owning worker.
+
+    python benchmarks/bench_cluster.py [max_workers] [rooms_per_worker] [hits] [split|local]
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import cluster  # noqa: E402
+
+
+def worker(index, n_workers, endpoint, owners, inboxes, barrier, rooms, hits, split, results):
+    os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+    os.environ.setdefault('DB_NAME', 'bench')
+    os.environ['SOCKETIO_MESSAGE_QUEUE'] = 'local'
+    logging.disable(logging.INFO)
+    cluster.use_local_backend(endpoint, cluster.SharedRoomDirectory(owners))
+    import server
+
+    async def run():
+        server.sio.manager_initialized = True
+        server.sio.manager.initialize()
+        server.score_ticker.start()
+
+        codes = []
+        for k in range(rooms):
+            await server.create_room(f"w{index}a{k}", {'username': 'A'})
+            codes.append(server.game_rooms.room_for_sid(f"w{index}a{k}").code)
+        inboxes[(index + 1) % n_workers if split else index].put(codes)
+        foreign = await asyncio.to_thread(inboxes[index].get)
+        await asyncio.to_thread(barrier.wait)
+
+        start = time.perf_counter()
+        for k, code in enumerate(foreign):
+            sid = f"w{index}b{k}"
+            await server.join_room(sid, {'room_code': code, 'username': 'B'})
+            await server.start_game(sid, {})
+            for _ in range(hits):
+                await server.player_hit(sid, {})
+                await server.player_hit(f"w{index}a{k}", {})
+            await server.game_end(sid, {})
+        if split and n_workers > 1:
+            # Wait until the forwarded events for our own rooms were applied
+            expected = rooms * (hits + 3)
+            while server.room_cluster.received < expected:
+                await asyncio.sleep(0.001)
+        elapsed = time.perf_counter() - start
+        await server.score_ticker.stop()
+        results.put((index, elapsed))
+        await asyncio.to_thread(barrier.wait)
+
+    asyncio.run(run())
+
+
+def bench(n_workers, rooms, hits, split):
+    context = multiprocessing.get_context('spawn')
+    broker = cluster.ProcessBroker(n_workers, context)
+    broker.start()
+    manager = context.Manager()
+    owners = manager.dict()
+    inboxes = [context.Queue() for _ in range(n_workers)]
+    barrier = context.Barrier(n_workers)
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(
+            i, n_workers, broker.endpoint(i), owners, inboxes, barrier, rooms, hits, split, results
+        ))
+        for i in range(n_workers)
+    ]
+    for p in processes:
+        p.start()
+    elapsed = max(results.get()[1] for _ in processes)
+    for p in processes:
+        p.join()
+    broker.stop()
+    manager.shutdown()
+    events = n_workers * rooms * (3 + 2 * hits)
+    return events, elapsed
+
+
+def main():
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count() or 1
+    rooms = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    hits = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    split = (sys.argv[4] if len(sys.argv) > 4 else 'split') == 'split'
+    print(f"cpus: {os.cpu_count()}, rooms/worker: {rooms}, hits/player: {hits}, "
+          f"placement: {'split' if split else 'local'}")
+    baseline = None
+    for n in range(1, max_workers + 1):
+        events, elapsed = bench(n, rooms, hits, split)
+        rate = events / elapsed
+        baseline = baseline or rate
+        print(f"workers: {n:2d}  events: {events:9d}  {rate:12.0f} events/s  x{rate / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    main()
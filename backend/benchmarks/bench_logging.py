@@ -0,0 +1,126 @@
+"""Hit-storm throughput with the old and the queued/sampled logging setup.
+
+legacy:  logger=True, engineio_logger=True and a synchronous StreamHandler,
+         so every packet writes the engine.io and Socket.IO INFO lines (plus
+         an f-string handler log) on the event loop.
+verbose: the same INFO lines, but through log_setup's queue (the loop only
+         enqueues; records beyond LOG_QUEUE_SIZE are dropped and counted).
+queued:  log_setup.configure_logging() with engine.io at ERROR, Socket.IO at
+         WARNING and player_hit sampled 1 in 1000 at DEBUG.
+
+Packets go through a real socketio.AsyncServer (_handle_eio_message) with
+the engine.io transport stubbed out; the engine.io receive line is logged
+the way engineio.async_socket does it. Log output goes to a file.
+
+    python benchmarks/bench_logging.py [hits]
+"""
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import socketio  # noqa: E402
+
+import log_setup  # noqa: E402
+
+
+def reset_logging():
+    root = logging.getLogger()
+    for handler in root.handlers:
+        handler.close()
+    root.handlers = []
+    for name in ("socketio.server", "engineio.server", "socketio.events", "bench"):
+        logger = logging.getLogger(name)
+        logger.handlers = []
+        logger.setLevel(logging.NOTSET)
+
+
+async def storm(sio, eio_logger, hits):
+    async def send(eio_sid, packet):
+        pass
+    sio.eio.send = send
+
+    eio_sid = "eio-bench"
+    await sio._handle_eio_connect(eio_sid, {})
+    await sio._handle_eio_message(eio_sid, "0")
+    packet = '2["player_hit",{"room_code":"ABC123"}]'
+    started = time.perf_counter()
+    for _ in range(hits):
+        eio_logger.info('%s: Received packet %s data %s', eio_sid, 'MESSAGE', packet)
+        await sio._handle_eio_message(eio_sid, packet)
+    return time.perf_counter() - started
+
+
+def legacy(hits, log_path):
+    reset_logging()
+    logging.basicConfig(
+        level=logging.INFO, filename=log_path,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    sio = socketio.AsyncServer(async_mode='asgi', logger=True, engineio_logger=True)
+    # logger=True adds its own stderr handler; keep the comparison to the file
+    sio.logger.handlers = []
+    sio.eio.logger.handlers = []
+    logger = logging.getLogger("bench")
+    hit_count = {}
+
+    @sio.event
+    async def player_hit(sid, data):
+        hit_count[sid] = hit_count.get(sid, 0) + 1
+        logger.info(f"Hit by {sid} in room {data['room_code']}")
+
+    return asyncio.run(storm(sio, sio.eio.logger, hits)), 0.0
+
+
+def queued(hits, log_path, verbose=False):
+    reset_logging()
+    out = open(log_path, "a")
+    log_setup.configure_logging(logging.INFO, stream=out)
+    sio = socketio.AsyncServer(
+        async_mode='asgi',
+        logger=log_setup.library_logger('socketio.server', 'INFO' if verbose else 'WARNING'),
+        engineio_logger=log_setup.library_logger('engineio.server', 'INFO' if verbose else 'ERROR')
+    )
+    if verbose:
+        events = log_setup.EventLoggers('socketio.events', 'player_hit=INFO', 'player_hit=1')
+        hit_log = events['player_hit'].info
+    else:
+        hit_log = log_setup.EventLoggers('socketio.events', 'player_hit=DEBUG')['player_hit'].debug
+    hit_count = {}
+
+    @sio.event
+    async def player_hit(sid, data):
+        hit_count[sid] = hit_count.get(sid, 0) + 1
+        hit_log("Hit by %s in room %s", sid, data['room_code'])
+
+    elapsed = asyncio.run(storm(sio, sio.eio.logger, hits))
+    drain_started = time.perf_counter()
+    log_setup.stop_logging()
+    out.close()
+    return elapsed, time.perf_counter() - drain_started
+
+
+def verbose(hits, log_path):
+    return queued(hits, log_path, verbose=True)
+
+
+def main():
+    hits = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, run in (("legacy", legacy), ("verbose", verbose), ("queued", queued)):
+            log_path = os.path.join(tmp, f"{name}.log")
+            elapsed, drain = run(hits, log_path)
+            with open(log_path) as f:
+                lines = sum(1 for _ in f)
+            print(f"{name:>7}: {hits / elapsed:>10,.0f} hits/s on the loop, {lines:>7} log lines, "
+                  f"{log_setup.dropped_records():>7} dropped, drain {drain * 1000:.1f} ms")
+    reset_logging()
+
+
+if __name__ == "__main__":
+    main()
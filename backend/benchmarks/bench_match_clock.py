@@ -0,0 +1,139 @@
+"""Match clock cost with 100k concurrent rooms.
+
+Every room gets a deadline spread over --spread seconds. Compares:
+
+    wheel     match_clock.TimerWheel on a simulated clock (schedule, then
+              advance tick by tick until everything fired)
+    heap      heapq of (deadline, room), popped per tick, lazily skipping
+              cancelled entries
+    tasks     one asyncio task per room sleeping until its deadline (real
+              time, deadlines scaled down to --task-spread seconds)
+
+Reports CPU per schedule/cancel and the worst single tick; for tasks, the
+time from the last deadline until every task finished and the memory the
+pending tasks held.
+
+    python benchmarks/bench_match_clock.py [--rooms 100000]
+"""
+import argparse
+import asyncio
+import heapq
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from match_clock import TimerWheel  # noqa: E402
+
+RESOLUTION = 0.1
+
+
+async def bench_wheel(deadlines, cancel_every):
+    clock = [0.0]
+    fired = [0]
+
+    async def on_expire(key):
+        fired[0] += 1
+
+    wheel = TimerWheel(on_expire, resolution=RESOLUTION, clock=lambda: clock[0])
+    started = time.perf_counter()
+    for i, deadline in enumerate(deadlines):
+        wheel.schedule(f"R{i}", deadline)
+    schedule_s = time.perf_counter() - started
+    started = time.perf_counter()
+    for i in range(0, len(deadlines), cancel_every):
+        wheel.cancel(f"R{i}")
+    cancel_s = time.perf_counter() - started
+    worst = 0.0
+    while len(wheel):
+        clock[0] += RESOLUTION
+        started = time.perf_counter()
+        await wheel.advance()
+        worst = max(worst, time.perf_counter() - started)
+    return schedule_s, cancel_s, worst, fired[0]
+
+
+def bench_heap(deadlines, cancel_every):
+    heap = []
+    cancelled = set()
+    started = time.perf_counter()
+    for i, deadline in enumerate(deadlines):
+        heapq.heappush(heap, (deadline, f"R{i}"))
+    schedule_s = time.perf_counter() - started
+    started = time.perf_counter()
+    for i in range(0, len(deadlines), cancel_every):
+        cancelled.add(f"R{i}")
+    cancel_s = time.perf_counter() - started
+    worst = 0.0
+    fired = 0
+    now = 0.0
+    while heap:
+        now += RESOLUTION
+        started = time.perf_counter()
+        while heap and heap[0][0] <= now:
+            _, key = heapq.heappop(heap)
+            if key in cancelled:
+                cancelled.discard(key)
+            else:
+                fired += 1
+        worst = max(worst, time.perf_counter() - started)
+    return schedule_s, cancel_s, worst, fired
+
+
+async def bench_tasks(rooms, spread, cancel_every):
+    fired = [0]
+
+    async def room_timer(delay):
+        await asyncio.sleep(delay)
+        fired[0] += 1
+
+    rng = random.Random(1)
+    tracemalloc.start()
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(room_timer(rng.uniform(0, spread))) for _ in range(rooms)]
+    schedule_s = time.perf_counter() - started
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    started = time.perf_counter()
+    for task in tasks[::cancel_every]:
+        task.cancel()
+    cancel_s = time.perf_counter() - started
+    started = time.perf_counter()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    overrun = time.perf_counter() - started - spread
+    return schedule_s, cancel_s, overrun, fired[0], memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, default=100_000)
+    parser.add_argument("--spread", type=float, default=11.5, help="deadlines between 0 and this many seconds")
+    parser.add_argument("--task-spread", type=float, default=2.0)
+    parser.add_argument("--cancel-every", type=int, default=3, help="cancel every Nth room (ended by its clients)")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    deadlines = [rng.uniform(0, args.spread) for _ in range(args.rooms)]
+    n = args.rooms
+    print(f"{n} rooms, 1 in {args.cancel_every} cancelled")
+    print(f"{'scheduler':<8}{'schedule us':>13}{'cancel us':>11}{'worst tick ms':>15}{'fired':>9}")
+    for name, result in (("wheel", asyncio.run(bench_wheel(deadlines, args.cancel_every))),
+                         ("heap", bench_heap(deadlines, args.cancel_every))):
+        schedule_s, cancel_s, worst, fired = result
+        cancels = len(range(0, n, args.cancel_every))
+        print(f"{name:<8}{schedule_s / n * 1e6:>13.2f}{cancel_s / cancels * 1e6:>11.2f}"
+              f"{worst * 1000:>15.3f}{fired:>9}")
+    schedule_s, cancel_s, overrun, fired, memory = asyncio.run(
+        bench_tasks(n, args.task_spread, args.cancel_every)
+    )
+    cancels = len(range(0, n, args.cancel_every))
+    print(f"{'tasks':<8}{schedule_s / n * 1e6:>13.2f}{cancel_s / cancels * 1e6:>11.2f}"
+          f"{'':>15}{fired:>9}   finished {overrun * 1000:.0f} ms after the last deadline, "
+          f"{memory / n:.0f} B/room")
+
+
+if __name__ == "__main__":
+    main()
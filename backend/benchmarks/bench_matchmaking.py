@@ -0,0 +1,97 @@
+"""Matchmaker throughput with 50k simulated players.
+
+Players arrive at --arrivals per second of simulated time with random
+total_scores, and the background tick runs every 50 ms of simulated time.
+Reports the real CPU time spent queueing and pairing, and the simulated
+time players waited for a match, for:
+
+    open       everyone in one band
+    banded     skill bands of --band total_score, widening every 2 s
+    limited    banded, at most --rate matches per second
+
+    python benchmarks/bench_matchmaking.py [--players 50000]
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from matchmaking import Matchmaker  # noqa: E402
+
+TICK = 0.05
+
+
+async def simulate(players, arrivals, **options):
+    clock = [0.0]
+    waits = []
+    gaps = []
+
+    async def on_match(first, second):
+        for ticket in (first, second):
+            waits.append(clock[0] - ticket.queued_at)
+        gaps.append(abs(first.rating - second.rating))
+
+    matchmaker = Matchmaker(on_match, interval=TICK, **options)
+    rng = random.Random(42)
+    ratings = [int(rng.paretovariate(1.5) * 500) for _ in range(players)]
+
+    enqueue_time = tick_time = 0.0
+    next_tick = TICK
+    for i, rating in enumerate(ratings):
+        clock[0] = i / arrivals
+        while next_tick <= clock[0]:
+            started = time.perf_counter()
+            await matchmaker.tick(next_tick)
+            tick_time += time.perf_counter() - started
+            next_tick += TICK
+        started = time.perf_counter()
+        await matchmaker.enqueue(f"p{i}", "Oyuncu", rating, now=clock[0])
+        enqueue_time += time.perf_counter() - started
+    # Let the queue drain for up to a minute of simulated time
+    deadline = clock[0] + 60
+    while len(matchmaker) > 1 and next_tick < deadline:
+        clock[0] = next_tick
+        started = time.perf_counter()
+        await matchmaker.tick(next_tick)
+        tick_time += time.perf_counter() - started
+        next_tick += TICK
+    return matchmaker, sorted(waits), sorted(gaps), enqueue_time, tick_time
+
+
+def pct(values, p):
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=50_000)
+    parser.add_argument("--arrivals", type=float, default=5000, help="players joining per simulated second")
+    parser.add_argument("--band", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=1000, help="matches per second for 'limited'")
+    args = parser.parse_args()
+
+    scenarios = {
+        "open": {},
+        "banded": {"band_width": args.band, "widen_after": 2.0},
+        "limited": {"band_width": args.band, "widen_after": 2.0, "matches_per_second": args.rate},
+    }
+    print(f"{args.players} players, {args.arrivals:.0f} arrivals/s")
+    print(f"{'scenario':<9}{'matched':>9}{'left':>6}{'enqueue us':>12}{'tick ms':>9}"
+          f"{'wait p50':>10}{'p99':>8}{'max':>8}{'gap p50':>9}{'p99':>8}")
+    for name, options in scenarios.items():
+        matchmaker, waits, gaps, enqueue_time, tick_time = asyncio.run(
+            simulate(args.players, args.arrivals, **options)
+        )
+        ticks = max(1, int(args.players / args.arrivals / TICK))
+        print(f"{name:<9}{matchmaker.matched:>9}{len(matchmaker):>6}"
+              f"{enqueue_time / args.players * 1e6:>12.2f}{tick_time / ticks * 1000:>9.3f}"
+              f"{pct(waits, 50):>9.2f}s{pct(waits, 99):>7.2f}s{waits[-1] if waits else 0:>7.2f}s"
+              f"{pct(gaps, 50):>9}{pct(gaps, 99):>8}")
+
+
+if __name__ == "__main__":
+    main()
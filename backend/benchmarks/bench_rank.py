@@ -0,0 +1,118 @@
+"""RankIndex cost with a large player base.
+
+Builds the index with load() from --players random user_stats documents,
+then times rank and neighbourhood lookups for random players and
+record() for random saves. For comparison, a linear count of higher
+scores over the same data stands in for the count_documents scan.
+
+Then times a periodic refresh (load() on a populated index) with --changed
+of the players' stats changed, and the longest the event loop went without
+running while it did.
+
+    python benchmarks/bench_rank.py [--players 1000000]
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rankings import RankIndex  # noqa: E402
+
+
+def timed(fn, args_list):
+    started = time.perf_counter()
+    for args in args_list:
+        fn(*args)
+    return (time.perf_counter() - started) / len(args_list) * 1e6
+
+
+class FakeCursor:
+    """Async cursor over in-memory docs, handing over control once per batch
+    the way a getMore round trip would."""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.size = 10000
+
+    def batch_size(self, size):
+        self.size = size
+        return self
+
+    async def __aiter__(self):
+        for i, doc in enumerate(self.docs):
+            if i % self.size == 0:
+                await asyncio.sleep(0)
+            yield doc
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection):
+        return FakeCursor(self.docs)
+
+
+async def timed_load(index):
+    stalls = [0.0]
+
+    async def ticker():
+        last = time.perf_counter()
+        while True:
+            await asyncio.sleep(0)
+            now = time.perf_counter()
+            stalls[0] = max(stalls[0], now - last)
+            last = now
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    await index.load()
+    elapsed = time.perf_counter() - started
+    task.cancel()
+    return elapsed, stalls[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=10_000)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--changed", type=float, default=0.01, help="share of players changed before a refresh")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    stored = [
+        {"user_id": f"u{i}", "username": f"Oyuncu {i}", "total_score": int(rng.paretovariate(1.2) * 100),
+         "best_score": 0, "games_played": 1}
+        for i in range(args.players)
+    ]
+    index = RankIndex(lambda: FakeCollection(stored), refresh_interval=0)
+    build_s, _ = asyncio.run(timed_load(index))
+
+    sample = [(f"u{rng.randrange(args.players)}",) for _ in range(args.lookups)]
+    saves = [(user_id, {"total_score": rng.randrange(200), "best_score": 0, "games_played": 1})
+             for (user_id,) in sample]
+    scores = [player["total_score"] for player in index._players.values()]
+    scan_sample = sample[:max(1, args.lookups // 1000)]
+
+    print(f"{args.players} players, build {build_s:.2f} s")
+    print(f"{'rank':<22}{timed(index.rank, sample):>10.2f} us")
+    print(f"{f'around (k={args.k})':<22}{timed(lambda u: index.around(u, args.k), sample):>10.2f} us")
+    print(f"{'record':<22}{timed(index.record, saves):>10.2f} us")
+    scan_us = timed(lambda u: sum(1 for s in scores if s > index._players[u]["total_score"]), scan_sample)
+    print(f"{'linear count':<22}{scan_us:>10.2f} us")
+
+    stored = [dict(doc) for doc in stored]
+    for doc in rng.sample(stored, int(len(stored) * args.changed)):
+        doc["total_score"] += rng.randrange(1, 200)
+    elapsed, stall = asyncio.run(timed_load(index))
+    print(f"refresh ({index.last_changes} changed) {elapsed:.2f} s, longest loop stall {stall * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
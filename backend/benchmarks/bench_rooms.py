@@ -0,0 +1,70 @@
+"""Disconnect cost with a large number of live rooms.
+
+Compares the old linear scan over a dict of dict rooms with the
+RoomRegistry sid index.
+
+    python benchmarks/bench_rooms.py [rooms]
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rooms import RoomRegistry  # noqa: E402
+
+
+def legacy_disconnect(game_rooms, sid):
+    for room_code, room in list(game_rooms.items()):
+        if sid in [room.get('player1'), room.get('player2')]:
+            del game_rooms[room_code]
+            break
+
+
+def bench_legacy(n_rooms, n_disconnects):
+    game_rooms = {}
+    for i in range(n_rooms):
+        game_rooms[f"R{i:06d}"] = {
+            'player1': f"a{i}",
+            'player2': f"b{i}",
+            'player1_score': 0,
+            'player2_score': 0,
+            'player1_username': 'Oyuncu 1',
+            'player2_username': 'Oyuncu 2',
+            'game_started': False
+        }
+    # Worst realistic case: the leaving players sit at the end of the dict
+    sids = [f"b{i}" for i in range(n_rooms - n_disconnects, n_rooms)]
+    start = time.perf_counter()
+    for sid in sids:
+        legacy_disconnect(game_rooms, sid)
+    return (time.perf_counter() - start) / n_disconnects
+
+
+def bench_registry(n_rooms, n_disconnects):
+    registry = RoomRegistry()
+    sids = []
+    for i in range(n_rooms):
+        room = registry.create(f"a{i}", 'Oyuncu 1')
+        registry.join(room, f"b{i}", 'Oyuncu 2')
+        sids.append(f"b{i}")
+    sids = sids[-n_disconnects:]
+    start = time.perf_counter()
+    for sid in sids:
+        room = registry.room_for_sid(sid)
+        registry.remove(room.code)
+    return (time.perf_counter() - start) / n_disconnects
+
+
+def main():
+    n_rooms = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    legacy = bench_legacy(n_rooms, 20)
+    indexed = bench_registry(n_rooms, min(n_rooms, 10_000))
+    print(f"rooms: {n_rooms}")
+    print(f"legacy scan disconnect:  {legacy * 1e6:12.1f} us/op")
+    print(f"registry disconnect:     {indexed * 1e6:12.3f} us/op")
+    print(f"speedup:                 {legacy / indexed:12.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Response serialization cost for /api/game/records and /api/leaderboard.
+
+Renders the same payloads the way each response pipeline does:
+
+    dict + json        untyped handler result, jsonable_encoder + JSONResponse
+                       (the old default)
+    model + json       response_model validation + JSONResponse
+    model + orjson     response_model validation + ORJSONResponse (current)
+    dict + orjson      ORJSONResponse on the raw dicts, no validation
+    cached             ResponseCache body (orjson, rendered once per fill)
+
+    python benchmarks/bench_serialization.py [--rows 10] [--iterations 20000]
+"""
+import argparse
+import os
+import sys
+import timeit
+import uuid
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def payloads(rows: int):
+    user_id = str(uuid.uuid4())
+    records = [
+        {"id": str(uuid.uuid4()), "user_id": user_id, "mode": "Tek Kişilik - Orta",
+         "score": 200 - i, "duration": 10, "date": "2026-10-17T12:00:00.000000+00:00"}
+        for i in range(rows)
+    ]
+    leaderboard = [
+        {"username": f"Oyuncu {i}", "total_score": 100000 - i * 37, "best_score": 250 - i,
+         "games_played": 400 + i}
+        for i in range(rows)
+    ]
+    return records, leaderboard
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "bench")
+    import orjson
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse, ORJSONResponse
+    from pydantic import TypeAdapter
+
+    import server
+
+    records, leaderboard = payloads(args.rows)
+    cases = [
+        ("game/records", records, TypeAdapter(List[server.GameRecord])),
+        ("leaderboard", leaderboard, TypeAdapter(List[server.LeaderboardEntry])),
+    ]
+    pipelines = {
+        "dict + json": lambda data, adapter: JSONResponse(jsonable_encoder(data)).body,
+        "model + json": lambda data, adapter: JSONResponse(
+            adapter.dump_python(adapter.validate_python(data), mode="json")).body,
+        "model + orjson": lambda data, adapter: ORJSONResponse(
+            adapter.dump_python(adapter.validate_python(data), mode="json")).body,
+        "dict + orjson": lambda data, adapter: ORJSONResponse(data).body,
+        "cached": lambda data, adapter: orjson.dumps(data, default=str),
+    }
+
+    print(f"{args.rows} rows per payload, {args.iterations} iterations")
+    print(f"{'pipeline':<16}" + "".join(f"{name + ' us':>18}" for name, _, _ in cases))
+    for label, render in pipelines.items():
+        line = f"{label:<16}"
+        for _, data, adapter in cases:
+            seconds = timeit.timeit(lambda: render(data, adapter), number=args.iterations)
+            line += f"{seconds / args.iterations * 1e6:>18.2f}"
+        print(line)
+    print("\nbody bytes: " + ", ".join(
+        f"{name} {len(pipelines['model + orjson'](data, adapter))}" for name, data, adapter in cases
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Bytes on the wire and encode/decode CPU per Socket.IO event.
+
+Compares the default JSON packets with the msgpack serializer
+(SOCKETIO_SERIALIZER=msgpack), each with the dict score payloads and the
+compact ones (SOCKETIO_COMPACT_SCORES=1). Sizes are the encoded Socket.IO
+packet as handed to engine.io; for JSON that's also the websocket frame
+payload, msgpack travels as a binary frame of the same size.
+
+    python benchmarks/bench_wire.py [iterations]
+"""
+import sys
+import timeit
+
+from socketio import packet
+
+try:
+    from socketio import msgpack_packet
+except ImportError:
+    sys.exit("needs the msgpack package")
+
+ROOM = "4ACE8E"
+# (event, dict payload, compact payload); None = same payload in both formats
+EVENTS = [
+    ("opponent_score", {"score": 137}, 137),
+    ("score_update", {"player1_score": 137, "player2_score": 121}, [137, 121]),
+    ("player_hits", {"room_code": ROOM, "count": 3}, None),
+    ("player_joined", {"player1_username": "Oyuncu 1", "player2_username": "Oyuncu 2"}, None),
+    ("game_ended", {"player1_score": 137, "player2_score": 121,
+                    "player1_username": "Oyuncu 1", "player2_username": "Oyuncu 2"}, None),
+]
+
+
+def measure(packet_class, event, payload, iterations):
+    pkt = packet_class(packet.EVENT, data=[event, payload], namespace="/")
+    encoded = pkt.encode()
+    encode_s = timeit.timeit(lambda: packet_class(packet.EVENT, data=[event, payload], namespace="/").encode(),
+                             number=iterations) / iterations
+    decode_s = timeit.timeit(lambda: packet_class(encoded_packet=encoded), number=iterations) / iterations
+    size = len(encoded.encode() if isinstance(encoded, str) else encoded)
+    return size, encode_s * 1e6, decode_s * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    formats = [("json", packet.Packet), ("msgpack", msgpack_packet.MsgPackPacket)]
+    print(f"{'event':<16}{'payload':<9}" + "".join(
+        f"{name + ' B':>11}{'enc us':>8}{'dec us':>8}" for name, _ in formats))
+    for event, payload, compact in EVENTS:
+        variants = [("dict", payload)] + ([("compact", compact)] if compact is not None else [])
+        for label, data in variants:
+            line = f"{event:<16}{label:<9}"
+            for _, packet_class in formats:
+                size, encode_us, decode_us = measure(packet_class, event, data, iterations)
+                line += f"{size:>11}{encode_us:>8.2f}{decode_us:>8.2f}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""Concurrent load test for the REST API and the Socket.IO match flow.
+
+In-process mode (default) drives server.app through ASGI and dispatches
+Socket.IO events through sio.handlers, rate limits included, against
+MONGO_URL or, with --mongo memory, the mongomock_motor in-memory stand-in.
+With --url the same scenarios run over HTTP and real Socket.IO clients
+against a server on localhost. Hits go out as player_hits batches of
+--hit-batch, the way the game client coalesces them.
+
+    python benchmarks/loadtest.py --users 200 --concurrency 50 --out results.json
+    python benchmarks/loadtest.py --url http://localhost:8001 --compare results.json
+
+Reports p50/p95/p99 latency and ops/sec per operation plus overall events/sec,
+and writes them as JSON so runs can be compared.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self.delivered = 0
+        self.started = time.perf_counter()
+
+    async def timed(self, op, coro):
+        start = time.perf_counter()
+        try:
+            return await coro
+        except Exception:
+            self.fail(op)
+            raise
+        finally:
+            self.samples.setdefault(op, []).append(time.perf_counter() - start)
+
+    def fail(self, op):
+        self.errors[op] = self.errors.get(op, 0) + 1
+
+    def count(self, op, seconds, n):
+        # Record n events that together took `seconds` (e.g. a hit storm)
+        self.samples.setdefault(op, []).extend([seconds / n] * n)
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        result = {}
+        for op, samples in sorted(self.samples.items()):
+            ordered = sorted(samples)
+
+            def pct(p):
+                return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000, 3)
+
+            result[op] = {
+                "count": len(ordered),
+                "errors": self.errors.get(op, 0),
+                "p50_ms": pct(50),
+                "p95_ms": pct(95),
+                "p99_ms": pct(99),
+                "per_sec": round(len(ordered) / sum(ordered), 1) if sum(ordered) else 0.0,
+            }
+        total = sum(s["count"] for s in result.values())
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "events_per_sec": round(total / elapsed, 1) if elapsed else 0.0,
+            "packets_delivered": self.delivered,
+            "operations": result,
+        }
+
+
+class ASGIClient:
+    """Just enough of an HTTP client to call an ASGI app in-process."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def request(self, method, path, body=None, token=None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        headers = [(b"content-type", b"application/json"), (b"host", b"loadtest")]
+        if token:
+            headers.append((b"authorization", f"Bearer {token}".encode()))
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+            "query_string": b"", "root_path": "", "headers": headers,
+            "client": ("127.0.0.1", 0), "server": ("loadtest", 80),
+        }
+        sent = False
+        response = {"status": None, "body": b""}
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": payload, "more_body": False}
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["body"] += message.get("body", b"")
+
+        await self.app(scope, receive, send)
+        if response["status"] >= 400:
+            raise RuntimeError(f"{method} {path} -> {response['status']}")
+        return json.loads(response["body"]) if response["body"] else None
+
+
+class HTTPClient:
+    def __init__(self, base_url, session):
+        self.base_url = base_url.rstrip("/")
+        self.session = session
+
+    async def request(self, method, path, body=None, token=None):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        async with self.session.request(method, self.base_url + path, json=body, headers=headers) as r:
+            if r.status >= 400:
+                raise RuntimeError(f"{method} {path} -> {r.status}")
+            return await r.json()
+
+
+async def gather_limited(concurrency, coros):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(coro):
+        async with semaphore:
+            try:
+                await coro
+            except Exception:
+                pass  # counted by the Recorder
+
+    await asyncio.gather(*(run(c) for c in coros))
+
+
+async def rest_scenario(http, rec, args):
+    run_id = uuid.uuid4().hex[:6]
+    tokens = [None] * args.users
+
+    async def user_flow(i):
+        email = f"load{run_id}{i}@example.com"
+        await rec.timed("register", http.request("POST", "/api/auth/register", {
+            "username": f"load{run_id}{i}", "email": email, "password": "loadtest"
+        }))
+        login = await rec.timed("login", http.request("POST", "/api/auth/login", {
+            "email": email, "password": "loadtest"
+        }))
+        tokens[i] = login["token"]
+
+    await gather_limited(args.concurrency, [user_flow(i) for i in range(args.users)])
+
+    async def game_flow(token, i):
+        for g in range(args.games):
+            await rec.timed("save_game", http.request("POST", "/api/game/save", {
+                "mode": "Tek Kişilik - Kolay", "score": (i * 7 + g * 13) % 250, "duration": 15
+            }, token))
+        await rec.timed("records", http.request("GET", "/api/game/records", token=token))
+        await rec.timed("leaderboard", http.request("GET", "/api/leaderboard"))
+        await rec.timed("me", http.request("GET", "/api/user/me", token=token))
+
+    await gather_limited(args.concurrency, [
+        game_flow(token, i) for i, token in enumerate(tokens) if token
+    ])
+
+
+def hit_batches(hits, batch):
+    return [min(batch, hits - sent) for sent in range(0, hits, batch)]
+
+
+def dispatch(server, event, sid, data):
+    # The registered handler, wrapped by the rate limiter like a client's event
+    return server.sio.handlers["/"][event](sid, data)
+
+
+async def inprocess_match(server, rec, i, hits, hit_batch):
+    # Register the sids with the Socket.IO manager so room emits fan out
+    a = await server.sio.manager.connect(f"la{i}", "/")
+    b = await server.sio.manager.connect(f"lb{i}", "/")
+    await rec.timed("create_room", dispatch(server, "create_room", a, {"username": "A"}))
+    code = server.game_rooms.room_for_sid(a).code
+    await rec.timed("join_room", dispatch(server, "join_room", b, {"room_code": code, "username": "B"}))
+    await rec.timed("start_game", dispatch(server, "start_game", a, {"room_code": code}))
+    batches = hit_batches(hits, hit_batch)
+    start = time.perf_counter()
+    for count in batches:
+        await dispatch(server, "player_hits", a, {"room_code": code, "count": count})
+        await dispatch(server, "player_hits", b, {"room_code": code, "count": count})
+        await asyncio.sleep(0)
+    rec.count("player_hits", time.perf_counter() - start, 2 * len(batches))
+    room = server.game_rooms.get(code)
+    if (room.player1_score, room.player2_score) != (hits, hits):
+        rec.fail("player_hits")  # rate limited or capped
+    await rec.timed("game_end", dispatch(server, "game_end", a, {"room_code": code}))
+    for sid in (a, b):
+        await dispatch(server, "disconnect", sid, "client disconnect")
+        await server.sio.manager.disconnect(sid, "/")
+
+
+async def socket_match(url, rec, i, hits, hit_batch, serializer="default"):
+    import socketio
+
+    a, b = socketio.AsyncClient(serializer=serializer), socketio.AsyncClient(serializer=serializer)
+    created = asyncio.get_running_loop().create_future()
+    joined = asyncio.Event()
+    ended = asyncio.Event()
+    a.on("room_created", lambda data: created.done() or created.set_result(data["room_code"]))
+    b.on("player_joined", lambda data: joined.set())
+    b.on("game_ended", lambda data: ended.set())
+    await a.connect(url, transports=["websocket"])
+    await b.connect(url, transports=["websocket"])
+    try:
+        await rec.timed("create_room", _emit_and_wait(a, "create_room", {"username": "A"}, created))
+        code = created.result()
+        await rec.timed("join_room", _emit_and_wait(
+            b, "join_room", {"room_code": code, "username": "B"}, joined.wait()))
+        await a.emit("start_game", {"room_code": code})
+        batches = hit_batches(hits, hit_batch)
+        start = time.perf_counter()
+        for count in batches:
+            await a.emit("player_hits", {"room_code": code, "count": count})
+            await b.emit("player_hits", {"room_code": code, "count": count})
+        rec.count("player_hits", time.perf_counter() - start, 2 * len(batches))
+        await rec.timed("game_end", _emit_and_wait(a, "game_end", {"room_code": code}, ended.wait()))
+    finally:
+        await a.disconnect()
+        await b.disconnect()
+
+
+async def _emit_and_wait(client, event, data, waitable):
+    await client.emit(event, data)
+    await asyncio.wait_for(waitable, 10)
+
+
+async def run_inprocess(args):
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "loadtest")
+    import server
+
+    if args.mongo == "memory":
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            sys.exit("--mongo memory needs the mongomock-motor package")
+        server.client = AsyncMongoMockClient()
+        server.db = server.client[os.environ["DB_NAME"]]
+
+    async def deliver(eio_sid, packet):
+        rec.delivered += 1
+    server.sio.eio.send_packet = deliver
+
+    rec = Recorder()
+    await server.app.router.startup()
+    try:
+        await rest_scenario(ASGIClient(server.app), rec, args)
+        await gather_limited(args.concurrency, [
+            inprocess_match(server, rec, i, args.hits, args.hit_batch) for i in range(args.matches)
+        ])
+    finally:
+        await server.app.router.shutdown()
+    return rec
+
+
+async def run_remote(args):
+    import aiohttp
+
+    rec = Recorder()
+    async with aiohttp.ClientSession() as session:
+        await rest_scenario(HTTPClient(args.url, session), rec, args)
+    await gather_limited(args.concurrency, [
+        socket_match(args.url, rec, i, args.hits, args.hit_batch, args.serializer) for i in range(args.matches)
+    ])
+    return rec
+
+
+def print_report(report, baseline=None):
+    print(f"{'operation':<14}{'count':>8}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>12}")
+    for op, s in report["operations"].items():
+        line = (f"{op:<14}{s['count']:>8}{s['errors']:>6}{s['p50_ms']:>10.2f}"
+                f"{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}{s['per_sec']:>12.1f}")
+        old = (baseline or {}).get("operations", {}).get(op)
+        if old and old["p95_ms"]:
+            line += f"   p95 {(s['p95_ms'] / old['p95_ms'] - 1) * 100:+.1f}%"
+        print(line)
+    print(f"elapsed: {report['elapsed_s']} s, {report['events_per_sec']} events/s overall")
+    if report.get("packets_delivered"):
+        print(f"Socket.IO packets delivered: {report['packets_delivered']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--mongo", choices=["url", "memory"], default="url" if os.environ.get("MONGO_URL") else "memory",
+                        help="in-process mode: use MONGO_URL or the in-memory stand-in")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--games", type=int, default=5, help="games saved per user")
+    parser.add_argument("--matches", type=int, default=50)
+    parser.add_argument("--hits", type=int, default=200, help="hits per player per match")
+    parser.add_argument("--hit-batch", type=int, default=10,
+                        help="hits per player_hits event (the player_hits rate limit is per event)")
+    parser.add_argument("--concurrency", type=int, default=25)
+    parser.add_argument("--serializer", choices=["default", "msgpack"], default="default",
+                        help="--url mode: must match the server's SOCKETIO_SERIALIZER")
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--compare", help="JSON report of an earlier run to diff against")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    rec = asyncio.run(run_remote(args) if args.url else run_inprocess(args))
+    report = {
+        "mode": "remote" if args.url else f"in-process/{args.mongo}",
+        "params": {k: getattr(args, k) for k in ("users", "games", "matches", "hits", "concurrency")},
+        **rec.summary(),
+    }
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_report(report, baseline)
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
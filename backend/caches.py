@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, NamedTuple, Optional
+
+import orjson
+
+import metrics
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries also expire after ``ttl`` seconds.
+
+    ``set`` accepts a shorter per-entry ttl (e.g. the time left until a token's
+    ``exp``). Lookups are counted as hits and misses both here and in the
+    cache_lookups_total metric. Not shared between workers: entries can lag
+    writes made by another process by up to ``ttl``.
+    """
+
+    def __init__(self, name: str, maxsize: int = 10000, ttl: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lookups = metrics.cache_lookups
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return self.peek(key, _MISSING) is not _MISSING
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > self.clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self._lookups.inc(self.name, "hit")
+                return value
+            del self._entries[key]
+        self.misses += 1
+        self._lookups.inc(self.name, "miss")
+        return default
+
+    def peek(self, key, default=None):
+        """Like get, without touching LRU order or the hit/miss counters."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= self.clock():
+            return default
+        return entry[1]
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            self._entries.pop(key, None)
+            return
+        self._entries[key] = (self.clock() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_s": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against ``etag``."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+class ResponseCache:
+    """JSON response bodies with ETags, cached per key with single-flight fills.
+
+    On a miss the first caller starts ``compute``; concurrent callers for the
+    same key await that one computation instead of starting their own.
+    ``invalidate`` drops the entry and detaches an in-flight computation, so
+    a result computed before a write is never stored after it.
+    """
+
+    def __init__(self, name: str, maxsize: int = 10000, ttl: float = 5.0):
+        self.cache = TTLCache(name, maxsize=maxsize, ttl=ttl)
+        self.computed = 0
+        self.coalesced = 0
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    @property
+    def name(self) -> str:
+        return self.cache.name
+
+    async def get(self, key, compute: Callable[[], Awaitable[Any]]) -> CachedResponse:
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fill(key, compute))
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+        # shield: one caller going away must not cancel the others' result
+        return await asyncio.shield(task)
+
+    async def _fill(self, key, compute) -> CachedResponse:
+        task = asyncio.current_task()
+        try:
+            value = await compute()
+            self.computed += 1
+            body = orjson.dumps(value, default=str)
+            entry = CachedResponse(body, '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"')
+            if self._inflight.get(key) is task:
+                self.cache.set(key, entry)
+            return entry
+        finally:
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+
+    def invalidate(self, key):
+        self.cache.invalidate(key)
+        self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.cache.stats(),
+            "computed": self.computed,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+        }
@@ -0,0 +1,345 @@
+import asyncio
+import json
+import logging
+import queue
+import threading
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import socketio
+from socketio.async_pubsub_manager import AsyncPubSubManager
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Multi-worker rooms.
+#
+# A room lives in the memory of the worker that created it (its owner), so the
+# hot path (hits, ticks, reaping) never leaves the process. A shared
+# RoomDirectory maps room codes to owners; a worker whose socket joins a
+# foreign room forwards that socket's room events to the owner over the
+# Socket.IO client manager, and the owner's emits reach the socket through the
+# same pub/sub channel.
+
+ROOM_CALL = 'room_call'
+
+
+# Room directories: room_code -> owner host id
+
+class LocalRoomDirectory:
+    def __init__(self):
+        self._owners: Dict[str, str] = {}
+
+    async def claim(self, room_code: str, host_id: str) -> bool:
+        return self._owners.setdefault(room_code, host_id) == host_id
+
+    async def lookup(self, room_code: str) -> Optional[str]:
+        return self._owners.get(room_code)
+
+    async def release(self, room_code: str, host_id: str):
+        if self._owners.get(room_code) == host_id:
+            del self._owners[room_code]
+
+
+class SharedRoomDirectory:
+    """Directory over a multiprocessing.Manager().dict() (local stand-in)."""
+
+    def __init__(self, mapping):
+        self._owners = mapping
+
+    async def claim(self, room_code: str, host_id: str) -> bool:
+        owner = await asyncio.to_thread(self._owners.setdefault, room_code, host_id)
+        return owner == host_id
+
+    async def lookup(self, room_code: str) -> Optional[str]:
+        return await asyncio.to_thread(self._owners.get, room_code)
+
+    async def release(self, room_code: str, host_id: str):
+        def release():
+            if self._owners.get(room_code) == host_id:
+                self._owners.pop(room_code, None)
+        await asyncio.to_thread(release)
+
+
+class MongoRoomDirectory:
+    def __init__(self, collection, ttl_seconds: int = 24 * 60 * 60):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+
+    async def ensure_indexes(self):
+        # Entries left behind by a crashed worker expire on their own
+        await self.collection.create_index(
+            [("created_at", ASCENDING)], expireAfterSeconds=self.ttl_seconds
+        )
+
+    async def claim(self, room_code: str, host_id: str) -> bool:
+        try:
+            await self.collection.insert_one({
+                "_id": room_code,
+                "host_id": host_id,
+                "created_at": datetime.now(timezone.utc)
+            })
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def lookup(self, room_code: str) -> Optional[str]:
+        entry = await self.collection.find_one({"_id": room_code}, {"host_id": 1})
+        return entry["host_id"] if entry else None
+
+    async def release(self, room_code: str, host_id: str):
+        await self.collection.delete_one({"_id": room_code, "host_id": host_id})
+
+
+# Message transport
+
+class _RoutingMixin:
+    """Client manager mixin that also delivers targeted room calls.
+
+    Regular Socket.IO traffic is handled by AsyncPubSubManager; messages with
+    method ``room_call`` addressed to this host are handed to ``on_room_call``.
+    Emits to a sid connected to this worker skip the message queue.
+    """
+
+    on_room_call: Optional[Callable[[dict], Awaitable[None]]] = None
+
+    async def emit(self, event, data, namespace=None, room=None, skip_sid=None,
+                   callback=None, to=None, **kwargs):
+        room = to or room
+        if callback is None and isinstance(room, str) and \
+                self.is_connected(room, namespace or '/'):
+            kwargs['ignore_queue'] = True
+        return await super().emit(event, data, namespace=namespace, room=room,
+                                  skip_sid=skip_sid, callback=callback, **kwargs)
+
+    async def send_room_call(self, target: str, message: dict):
+        await self._publish({**message, 'method': ROOM_CALL, 'target': target,
+                             'host_id': self.host_id})
+
+    async def _listen(self):
+        async for message in super()._listen():
+            data = message
+            if not isinstance(message, dict):
+                # Only decode here what might be a room call; the base class
+                # parses everything else itself
+                marker = ROOM_CALL.encode() if isinstance(message, bytes) else ROOM_CALL
+                if marker not in message:
+                    yield message
+                    continue
+                data = json.loads(message)
+            if data.get('method') == ROOM_CALL:
+                if data.get('target') == self.host_id and self.on_room_call:
+                    try:
+                        await self.on_room_call(data)
+                    except Exception:
+                        logger.exception("Room call failed")
+                continue
+            yield message
+
+
+class RedisClusterManager(_RoutingMixin, socketio.AsyncRedisManager):
+    name = 'redis-cluster'
+
+
+class _Broker:
+    def __init__(self, queues: List):
+        self.queues = queues
+
+    def route(self, message: dict, sender: int):
+        target = message.get('target')
+        if target is not None:
+            return [self.queues[int(target.rsplit('-', 1)[1])]]
+        return [q for i, q in enumerate(self.queues) if i != sender]
+
+
+class InProcessBroker(_Broker):
+    """Fan-out between several servers living in one event loop (tests)."""
+
+    def __init__(self, workers: int):
+        super().__init__([asyncio.Queue() for _ in range(workers)])
+
+    def endpoint(self, index: int) -> 'LocalEndpoint':
+        return LocalEndpoint(self, index)
+
+    def publish(self, message: dict, sender: int):
+        for q in self.route(message, sender):
+            q.put_nowait(message)
+
+    async def receive(self, index: int):
+        return await self.queues[index].get()
+
+
+class ProcessBroker(_Broker):
+    """Fan-out between worker processes over multiprocessing queues.
+
+    A stand-in for a real message queue server: workers publish into one
+    inbound queue and a thread in the parent process copies each message to
+    the outbound queue of every other worker (or only to the addressed one).
+    """
+
+    def __init__(self, workers: int, context=None):
+        import multiprocessing
+        context = context or multiprocessing.get_context()
+        super().__init__([context.Queue() for _ in range(workers)])
+        self.inbound = context.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    def __getstate__(self):
+        return {"queues": self.queues, "inbound": self.inbound, "_thread": None}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._fan_out, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.inbound.put(None)
+        if self._thread is not None:
+            self._thread.join()
+
+    def _fan_out(self):
+        while True:
+            item = self.inbound.get()
+            if item is None:
+                return
+            sender, message = item
+            for q in self.route(message, sender):
+                q.put(message)
+
+    def endpoint(self, index: int) -> 'LocalEndpoint':
+        return LocalEndpoint(self, index)
+
+    def publish(self, message: dict, sender: int):
+        self.inbound.put((sender, message))
+
+    async def receive(self, index: int):
+        q = self.queues[index]
+        while True:
+            try:
+                return q.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                # Short timeout so the worker thread never outlives the loop
+                return await asyncio.to_thread(q.get, True, 0.1)
+            except queue.Empty:
+                pass
+
+
+class LocalEndpoint:
+    def __init__(self, broker, index: int):
+        self.broker = broker
+        self.index = index
+        self.host_id = f"worker-{index}"
+
+
+class LocalPubSubManager(AsyncPubSubManager):
+    """Pub/sub manager over an InProcessBroker or ProcessBroker endpoint."""
+
+    name = 'local'
+
+    def __init__(self, endpoint: LocalEndpoint, channel='socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.endpoint = endpoint
+        self.host_id = endpoint.host_id
+
+    async def _publish(self, data):
+        self.endpoint.broker.publish(data, self.endpoint.index)
+
+    async def _listen(self):
+        while True:
+            yield await self.endpoint.broker.receive(self.endpoint.index)
+
+
+class LocalClusterManager(_RoutingMixin, LocalPubSubManager):
+    name = 'local-cluster'
+
+
+class Cluster:
+    """Routes room events to the worker that owns the room.
+
+    With no directory configured (single worker) every room is local and
+    all methods are cheap no-ops.
+    """
+
+    def __init__(self, manager=None, directory=None):
+        self.manager = manager
+        self.directory = directory
+        self.host_id = getattr(manager, 'host_id', 'local')
+        self.forwarded = 0
+        self.received = 0
+        self._handlers: Dict[str, Callable] = {}
+        self._remote_owner: Dict[str, str] = {}
+        if manager is not None:
+            manager.on_room_call = self._on_room_call
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    def register(self, name: str, handler: Callable):
+        self._handlers[name] = handler
+
+    async def claim(self, room_code: str) -> bool:
+        if not self.enabled:
+            return True
+        return await self.directory.claim(room_code, self.host_id)
+
+    async def release(self, room_code: str):
+        if self.enabled:
+            await self.directory.release(room_code, self.host_id)
+
+    async def owner_of(self, room_code: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        return await self.directory.lookup(room_code)
+
+    def remote_owner(self, sid: str) -> Optional[str]:
+        return self._remote_owner.get(sid)
+
+    def bind(self, sid: str, owner: str):
+        self._remote_owner[sid] = owner
+
+    def unbind(self, sid: str) -> Optional[str]:
+        return self._remote_owner.pop(sid, None)
+
+    async def forward(self, owner: str, event: str, sid: str, data):
+        self.forwarded += 1
+        await self.manager.send_room_call(owner, {'event': event, 'sid': sid, 'data': data})
+
+    async def _on_room_call(self, message: dict):
+        handler = self._handlers.get(message.get('event'))
+        if handler is None:
+            return
+        self.received += 1
+        await handler(message['sid'], message.get('data'))
+
+    def stats(self) -> dict:
+        return {
+            "host_id": self.host_id,
+            "enabled": self.enabled,
+            "remote_sids": len(self._remote_owner),
+            "forwarded": self.forwarded,
+            "received": self.received,
+        }
+
+
+_local_backend: Optional[tuple] = None
+
+
+def use_local_backend(endpoint: LocalEndpoint, directory):
+    """Select the in-process/multiprocessing stand-in for SOCKETIO_MESSAGE_QUEUE=local."""
+    global _local_backend
+    _local_backend = (endpoint, directory)
+
+
+def from_env(url: Optional[str], db) -> tuple:
+    """Build (client_manager, room_directory) for SOCKETIO_MESSAGE_QUEUE."""
+    if not url:
+        return None, None
+    if url == 'local':
+        if _local_backend is None:
+            raise RuntimeError("SOCKETIO_MESSAGE_QUEUE=local requires cluster.use_local_backend()")
+        endpoint, directory = _local_backend
+        return LocalClusterManager(endpoint), directory
+    return RedisClusterManager(url), MongoRoomDirectory(db.room_directory)
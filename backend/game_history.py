@@ -0,0 +1,83 @@
+import base64
+import json
+from typing import AsyncIterator, List, Optional, Tuple
+
+import orjson
+from pymongo import ASCENDING, DESCENDING
+
+# Keyset pagination over a player's games. Pages are ordered by
+# (score, id) or (date, id), newest/highest first, and a cursor is the sort
+# key of the last game on the previous page, so every page is an index
+# range scan no matter how deep it is (see the games indexes in
+# migrations.py).
+SORT_FIELDS = ("score", "date")
+# Pages carry the GameRecord fields; the export has everything but _id and
+# the server's apply bookkeeping
+PAGE_PROJECTION = {"_id": 0, "id": 1, "user_id": 1, "mode": 1, "score": 1, "duration": 1, "date": 1}
+EXPORT_PROJECTION = {"_id": 0, "applied": 0}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(game: dict, sort: str) -> str:
+    raw = json.dumps([game[sort], game["id"]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[object, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, game_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    expected = (int, float) if sort == "score" else str
+    if not isinstance(value, expected) or isinstance(value, bool) or not isinstance(game_id, str):
+        raise InvalidCursor(cursor)
+    return value, game_id
+
+
+def _filter(user_id: str, mode: Optional[str]) -> dict:
+    query = {"user_id": user_id}
+    if mode is not None:
+        query["mode"] = mode
+    return query
+
+
+async def page(db, user_id: str, sort: str = "date", mode: Optional[str] = None,
+               limit: int = 20, cursor: Optional[str] = None) -> dict:
+    """One page of a player's games: {"items": [...], "next_cursor": str | None}."""
+    query = _filter(user_id, mode)
+    if cursor is not None:
+        value, game_id = decode_cursor(cursor, sort)
+        query["$or"] = [
+            {sort: {"$lt": value}},
+            {sort: value, "id": {"$lt": game_id}},
+        ]
+    # One extra document tells us whether there is a next page
+    games: List[dict] = await db.games.find(query, PAGE_PROJECTION).sort(
+        [(sort, DESCENDING), ("id", DESCENDING)]
+    ).limit(limit + 1).to_list(limit + 1)
+    next_cursor = encode_cursor(games[limit - 1], sort) if len(games) > limit else None
+    return {"items": games[:limit], "next_cursor": next_cursor}
+
+
+async def export_ndjson(db, user_id: str, mode: Optional[str] = None,
+                        batch_size: int = 1000) -> AsyncIterator[bytes]:
+    """Every game of a player, oldest first, as NDJSON chunks.
+
+    Motor fetches ``batch_size`` documents per round trip and each batch is
+    written out as one chunk, so memory use doesn't grow with the history.
+    """
+    cursor = db.games.find(_filter(user_id, mode), EXPORT_PROJECTION).sort(
+        [("date", ASCENDING), ("id", ASCENDING)]
+    ).batch_size(batch_size)
+    lines = []
+    async for game in cursor:
+        lines.append(orjson.dumps(game, default=str))
+        if len(lines) >= batch_size:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
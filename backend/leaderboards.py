@@ -0,0 +1,150 @@
+import logging
+from datetime import datetime, time, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Time-windowed and per-mode leaderboards, rolled up as games are saved.
+#
+# Every game adds its score to a handful of (board, user) bucket documents in
+# db.leaderboard_buckets:
+#   {board, user_id, username, total_score, best_score, games_played, expires_at}
+# where board is "day:2026-10-17", "week:2026-W42" or "all", optionally
+# narrowed to one mode ("day:2026-10-17:Online Mod"). The all-modes all-time
+# board is user_stats (see user_stats.py) and has no buckets. Reading a board
+# is one (board, total_score) index range; day and week buckets carry an
+# expires_at that the TTL index uses to drop them once they are past RETENTION.
+WINDOWS = ("day", "week", "all")
+# Modes with boards of their own. Games in any other mode still count towards
+# the all-modes boards, but a client can't open never-expiring "all:<mode>"
+# buckets by making up mode names.
+MODES = ("Tek Kişilik - Kolay", "Tek Kişilik - Orta", "Tek Kişilik - Zor", "Online Mod")
+RETENTION = {"day": timedelta(days=8), "week": timedelta(weeks=5)}
+BUCKET_PROJECTION = {
+    "_id": 0,
+    "username": 1,
+    "total_score": 1,
+    "best_score": 1,
+    "games_played": 1,
+}
+
+
+def period_of(window: str, when: datetime) -> Tuple[str, Optional[datetime]]:
+    """(period key, end of the period) of a UTC timestamp."""
+    day = when.astimezone(timezone.utc).date()
+    if window == "day":
+        return day.isoformat(), datetime.combine(day + timedelta(days=1), time(), timezone.utc)
+    if window == "week":
+        year, week, weekday = day.isocalendar()
+        start = day - timedelta(days=weekday - 1)
+        return f"{year}-W{week:02d}", datetime.combine(start + timedelta(weeks=1), time(), timezone.utc)
+    return "", None
+
+
+def board_key(window: str, when: datetime, mode: Optional[str] = None) -> str:
+    period, _ = period_of(window, when)
+    return ":".join(part for part in (window, period, mode) if part)
+
+
+def boards_for(game: dict) -> List[Tuple[str, Optional[datetime]]]:
+    """(board, expires_at) of every bucket a game document counts towards."""
+    when = datetime.fromisoformat(game["date"])
+    modes = (None, game["mode"]) if game["mode"] in MODES else (None,)
+    boards = []
+    for window in WINDOWS:
+        period, ends = period_of(window, when)
+        expires_at = ends + RETENTION[window] if ends is not None else None
+        for mode in modes:
+            if window == "all" and mode is None:
+                continue  # user_stats
+            boards.append((":".join(part for part in (window, period, mode) if part), expires_at))
+    return boards
+
+
+def _add(buckets: Dict[Tuple[str, str], dict], game: dict):
+    for board, expires_at in boards_for(game):
+        totals = buckets.setdefault((board, game["user_id"]), {
+            "total_score": 0, "best_score": 0, "games_played": 0, "expires_at": expires_at
+        })
+        totals["total_score"] += game["score"]
+        totals["games_played"] += 1
+        if game["score"] > totals["best_score"]:
+            totals["best_score"] = game["score"]
+
+
+def summarize(games: Iterable[dict]) -> Dict[Tuple[str, str], dict]:
+    """Per-(board, user) totals of a list of game documents."""
+    buckets: Dict[Tuple[str, str], dict] = {}
+    for game in games:
+        _add(buckets, game)
+    return buckets
+
+
+async def _usernames(db, user_ids) -> Dict[str, str]:
+    return {
+        user["id"]: user["username"]
+        async for user in db.users.find({"id": {"$in": list(user_ids)}}, {"_id": 0, "id": 1, "username": 1})
+    }
+
+
+async def record_games(db, games: List[dict], usernames: Optional[Dict[str, str]] = None):
+    """$inc the saved games into their buckets with one unordered bulk write."""
+    buckets = summarize(games)
+    if not buckets:
+        return
+    if usernames is None:
+        usernames = await _usernames(db, {user_id for _, user_id in buckets})
+    ops = []
+    for (board, user_id), totals in buckets.items():
+        on_insert = {"board": board, "user_id": user_id}
+        if totals["expires_at"] is not None:
+            on_insert["expires_at"] = totals["expires_at"]
+        update = {
+            "$inc": {"total_score": totals["total_score"], "games_played": totals["games_played"]},
+            "$max": {"best_score": totals["best_score"]},
+            "$setOnInsert": on_insert,
+        }
+        if user_id in usernames:
+            update["$set"] = {"username": usernames[user_id]}
+        ops.append(UpdateOne({"board": board, "user_id": user_id}, update, upsert=True))
+    await db.leaderboard_buckets.bulk_write(ops, ordered=False)
+
+
+async def top_n(db, board: str, limit: int = 10):
+    return await db.leaderboard_buckets.find(
+        {"board": board}, BUCKET_PROJECTION
+    ).sort("total_score", -1).limit(limit).to_list(limit)
+
+
+async def rebuild(db, batch_size: int = 1000) -> int:
+    """Recompute every bucket from db.games (buckets already expired stay gone)."""
+    now = datetime.now(timezone.utc)
+    buckets: Dict[Tuple[str, str], dict] = {}
+    cursor = db.games.find({}, {"_id": 0, "user_id": 1, "mode": 1, "score": 1, "date": 1})
+    async for game in cursor.batch_size(batch_size):
+        _add(buckets, game)
+    usernames = await _usernames(db, {user_id for _, user_id in buckets})
+
+    written = 0
+    ops = []
+    for (board, user_id), totals in buckets.items():
+        if totals["expires_at"] is not None and totals["expires_at"] <= now:
+            continue
+        document = {"board": board, "user_id": user_id, **totals}
+        if totals["expires_at"] is None:
+            del document["expires_at"]
+        if user_id in usernames:
+            document["username"] = usernames[user_id]
+        ops.append(UpdateOne({"board": board, "user_id": user_id}, {"$set": document}, upsert=True))
+        if len(ops) >= batch_size:
+            await db.leaderboard_buckets.bulk_write(ops, ordered=False)
+            written += len(ops)
+            ops = []
+    if ops:
+        await db.leaderboard_buckets.bulk_write(ops, ordered=False)
+        written += len(ops)
+
+    logger.info(f"Rebuilt {written} leaderboard buckets")
+    return written
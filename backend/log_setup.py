@@ -0,0 +1,148 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+from typing import Dict
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks the event loop.
+
+    Records are formatted by the listener thread instead of the caller, and
+    when the queue is full new records are dropped and counted.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Same process, so the record doesn't need to be made picklable;
+        # leave message formatting to the listener thread
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_queue_handler = None
+_listener = None
+
+
+def configure_logging(level: int = logging.INFO, max_queue: int = 10000, stream=None):
+    """Route all logging through a bounded queue drained by a background thread."""
+    global _queue_handler, _listener
+    log_queue = queue.Queue(maxsize=max_queue)
+    output = logging.StreamHandler(stream)
+    output.setFormatter(logging.Formatter(LOG_FORMAT))
+    listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    listener.start()
+    _listener = listener
+    atexit.register(stop_logging)
+
+    _queue_handler = DroppingQueueHandler(log_queue)
+    root = logging.getLogger()
+    root.handlers = [_queue_handler]
+    root.setLevel(level)
+    return listener
+
+
+def stop_logging():
+    """Flush the queue and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+        atexit.unregister(stop_logging)
+
+
+def dropped_records() -> int:
+    return _queue_handler.dropped if _queue_handler else 0
+
+
+def library_logger(name: str, level_name: str) -> logging.Logger:
+    """A library logger (socketio/engineio) at the given level, using the root queue."""
+    library = logging.getLogger(name)
+    library.setLevel(logging.getLevelName(level_name.upper()))
+    return library
+
+
+def _parse_mapping(value: str) -> Dict[str, str]:
+    # "player_hit=DEBUG,create_room=INFO" -> {"player_hit": "DEBUG", ...}
+    mapping = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        key, _, setting = item.partition('=')
+        mapping[key.strip()] = setting.strip()
+    return mapping
+
+
+class EventLogger:
+    """Logger for one Socket.IO event with its own level and 1-in-N sampling.
+
+    ``isEnabledFor`` is checked before anything else, so a disabled event
+    costs one method call and no string formatting.
+    """
+
+    __slots__ = ("logger", "sample_every", "_seen")
+
+    def __init__(self, logger: logging.Logger, sample_every: int = 1):
+        self.logger = logger
+        self.sample_every = max(1, sample_every)
+        self._seen = 0
+
+    def log(self, level: int, msg: str, *args):
+        if not self.logger.isEnabledFor(level):
+            return
+        if self.sample_every > 1:
+            self._seen += 1
+            if self._seen % self.sample_every:
+                return
+            msg = f"{msg} (1/{self.sample_every} sampled)"
+        self.logger.log(level, msg, *args)
+
+    def debug(self, msg: str, *args):
+        self.log(logging.DEBUG, msg, *args)
+
+    def info(self, msg: str, *args):
+        self.log(logging.INFO, msg, *args)
+
+
+class EventLoggers:
+    """Per-event loggers named ``<base>.<event>``.
+
+    Levels come from SOCKETIO_EVENT_LOG_LEVELS ("player_hit=DEBUG,...") and
+    sampling from SOCKETIO_EVENT_LOG_SAMPLE ("player_hit=1000" logs one hit
+    in a thousand). Unlisted events use the base logger's level.
+    """
+
+    DEFAULT_SAMPLE = {"player_hit": "1000", "player_hits": "100"}
+
+    def __init__(self, base: str, levels: str = "", samples: str = ""):
+        self.base = base
+        self.levels = _parse_mapping(levels)
+        self.samples = {**self.DEFAULT_SAMPLE, **_parse_mapping(samples)}
+        self._loggers: Dict[str, EventLogger] = {}
+
+    @classmethod
+    def from_env(cls, base: str) -> 'EventLoggers':
+        return cls(
+            base,
+            os.environ.get('SOCKETIO_EVENT_LOG_LEVELS', ''),
+            os.environ.get('SOCKETIO_EVENT_LOG_SAMPLE', ''),
+        )
+
+    def __getitem__(self, event: str) -> EventLogger:
+        event_logger = self._loggers.get(event)
+        if event_logger is None:
+            logger = logging.getLogger(f"{self.base}.{event}")
+            if event in self.levels:
+                logger.setLevel(logging.getLevelName(self.levels[event].upper()))
+            event_logger = EventLogger(logger, int(self.samples.get(event, "1")))
+            self._loggers[event] = event_logger
+        return event_logger
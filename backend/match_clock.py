@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import math
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TimerWheel:
+    """Deadlines for many keys driven by one background task.
+
+    A hashed timing wheel: time is cut into ``resolution``-second ticks and a
+    key due at tick t sits in slot ``t % slots``, so ``schedule`` and
+    ``cancel`` are O(1) dict operations however many keys are pending. The
+    task wakes once per tick and only looks at the slot for that tick; keys
+    due more than a full turn ahead stay in their slot until their tick
+    comes round. Expired keys are handed to ``on_expire`` one by one.
+
+    A deadline fires up to one ``resolution`` late, never early.
+    """
+
+    def __init__(self, on_expire: Callable[[str], Awaitable[None]],
+                 resolution: float = 0.1, slots: int = 1024,
+                 clock: Callable[[], float] = time.monotonic):
+        self.on_expire = on_expire
+        self.resolution = resolution
+        self.clock = clock
+        self.scheduled = 0
+        self.cancelled = 0
+        self.fired = 0
+        self.ticks = 0
+        self.max_lag_ms = 0.0
+        self._slots: List[Dict[str, int]] = [{} for _ in range(slots)]
+        self._slot_of: Dict[str, int] = {}
+        self._origin = clock()
+        self._tick = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._slot_of
+
+    def _tick_at(self, now: float) -> int:
+        return int((now - self._origin) / self.resolution)
+
+    def schedule(self, key: str, delay: float, now: Optional[float] = None):
+        """(Re)arm ``key`` to expire ``delay`` seconds from now."""
+        now = self.clock() if now is None else now
+        self.cancel(key, counted=False)
+        due = max(self._tick + 1, math.ceil((now + delay - self._origin) / self.resolution))
+        slot = due % len(self._slots)
+        self._slots[slot][key] = due
+        self._slot_of[key] = slot
+        self.scheduled += 1
+
+    def cancel(self, key: str, counted: bool = True) -> bool:
+        slot = self._slot_of.pop(key, None)
+        if slot is None:
+            return False
+        del self._slots[slot][key]
+        if counted:
+            self.cancelled += 1
+        return True
+
+    def expire(self, now: Optional[float] = None) -> List[str]:
+        """Remove and return every key due by ``now``."""
+        target = self._tick_at(self.clock() if now is None else now)
+        if target <= self._tick:
+            return []
+        expired = []
+        # After a stall longer than a turn every slot is due once
+        for tick in range(self._tick + 1, min(target, self._tick + len(self._slots)) + 1):
+            bucket = self._slots[tick % len(self._slots)]
+            if not bucket:
+                continue
+            due = [key for key, due_tick in bucket.items() if due_tick <= target]
+            for key in due:
+                del bucket[key]
+                del self._slot_of[key]
+            expired.extend(due)
+        self.ticks += target - self._tick
+        self._tick = target
+        self.fired += len(expired)
+        return expired
+
+    async def advance(self, now: Optional[float] = None):
+        for key in self.expire(now):
+            try:
+                await self.on_expire(key)
+            except Exception:
+                logger.exception("Timer for %s failed", key)
+
+    async def run(self):
+        while True:
+            next_tick = self._origin + (self._tick + 1) * self.resolution
+            await asyncio.sleep(max(0.0, next_tick - self.clock()))
+            now = self.clock()
+            self.max_lag_ms = max(self.max_lag_ms, (now - next_tick) * 1000)
+            try:
+                await self.advance(now)
+            except Exception:
+                logger.exception("Timer wheel tick failed")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._slot_of),
+            "scheduled": self.scheduled,
+            "cancelled": self.cancelled,
+            "fired": self.fired,
+            "ticks": self.ticks,
+            "max_lag_ms": round(self.max_lag_ms, 3),
+            "resolution": self.resolution,
+            "slots": len(self._slots),
+        }
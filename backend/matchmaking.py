@@ -0,0 +1,203 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class Ticket:
+    sid: str
+    username: str
+    rating: int = 0
+    band: int = 0
+    queued_at: float = field(default_factory=time.monotonic)
+    user_id: Optional[str] = None
+
+
+class Matchmaker:
+    """In-memory matchmaking queue for online games.
+
+    Waiting players sit in one FIFO per skill band (``rating // band_width``;
+    ``band_width`` 0 puts everyone in one band). A player joining a band that
+    already has someone waiting is paired straight away; ``cancel`` is O(1).
+    Players left alone in their band are paired with a neighbouring band once
+    both have waited ``widen_after`` seconds, one more band per further
+    ``widen_after``, by a background task that wakes every ``interval``.
+
+    ``matches_per_second`` (0 = unlimited) caps how many pairs are handed to
+    ``on_match``; pairs over the cap stay queued for later ticks.
+    """
+
+    def __init__(self, on_match: Callable[[Ticket, Ticket], Awaitable[None]],
+                 band_width: int = 0, widen_after: float = 5.0,
+                 matches_per_second: float = 0, interval: float = 0.05):
+        self.on_match = on_match
+        self.band_width = band_width
+        self.widen_after = widen_after
+        self.matches_per_second = matches_per_second
+        self.interval = interval
+        self.queued = 0
+        self.matched = 0
+        self.cancelled = 0
+        self.widened = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._bands: Dict[int, "OrderedDict[str, Ticket]"] = {}
+        self._tickets: Dict[str, Ticket] = {}
+        self._tokens = float(max(1.0, matches_per_second))
+        self._refilled_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._tickets)
+
+    def __contains__(self, sid: str) -> bool:
+        return sid in self._tickets
+
+    def band_for(self, rating: int) -> int:
+        return rating // self.band_width if self.band_width > 0 else 0
+
+    def _take_token(self, now: float) -> bool:
+        if self.matches_per_second <= 0:
+            return True
+        capacity = max(1.0, self.matches_per_second)
+        if self._refilled_at is not None:
+            self._tokens = min(capacity, self._tokens + (now - self._refilled_at) * self.matches_per_second)
+        self._refilled_at = now
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return True
+        return False
+
+    def _pop(self, ticket: Ticket):
+        del self._tickets[ticket.sid]
+        queue = self._bands[ticket.band]
+        del queue[ticket.sid]
+        if not queue:
+            del self._bands[ticket.band]
+
+    def _record(self, first: Ticket, second: Ticket, now: float):
+        self.matched += 1
+        for ticket in (first, second):
+            waited = now - ticket.queued_at
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+    async def enqueue(self, sid: str, username: str, rating: int = 0,
+                      user_id: Optional[str] = None, now: Optional[float] = None) -> Optional[Ticket]:
+        """Queue a player; returns the opponent if they were paired at once."""
+        now = time.monotonic() if now is None else now
+        self.cancel(sid, counted=False)
+        ticket = Ticket(sid, username, rating, self.band_for(rating), now, user_id)
+        self.queued += 1
+        queue = self._bands.get(ticket.band)
+        if queue and self._take_token(now):
+            opponent = next(iter(queue.values()))
+            self._pop(opponent)
+            self._record(opponent, ticket, now)
+            await self.on_match(opponent, ticket)
+            return opponent
+        self._bands.setdefault(ticket.band, OrderedDict())[sid] = ticket
+        self._tickets[sid] = ticket
+        return None
+
+    def cancel(self, sid: str, counted: bool = True) -> bool:
+        ticket = self._tickets.get(sid)
+        if ticket is None:
+            return False
+        self._pop(ticket)
+        if counted:
+            self.cancelled += 1
+        return True
+
+    def pair(self, now: Optional[float] = None) -> List[Tuple[Ticket, Ticket]]:
+        """Take every pair that can be made now, within the rate limit."""
+        now = time.monotonic() if now is None else now
+        pairs = []
+        limited = False
+        for band in list(self._bands):
+            queue = self._bands.get(band)
+            while queue is not None and len(queue) >= 2:
+                if not self._take_token(now):
+                    limited = True
+                    break
+                tickets = iter(queue.values())
+                first, second = next(tickets), next(tickets)
+                self._pop(first)
+                self._pop(second)
+                pairs.append((first, second))
+                queue = self._bands.get(band)
+            if limited:
+                break
+
+        if not limited and self.band_width > 0 and self.widen_after > 0 and len(self._bands) > 1:
+            # Every band now holds at most one player; pair neighbours that
+            # have waited long enough to accept the band gap between them
+            waiting = sorted(
+                (next(iter(queue.values())) for queue in self._bands.values()),
+                key=lambda t: t.band
+            )
+            i = 0
+            while i < len(waiting) - 1:
+                first, second = waiting[i], waiting[i + 1]
+                allowed = min(now - first.queued_at, now - second.queued_at) // self.widen_after
+                if second.band - first.band <= allowed:
+                    if not self._take_token(now):
+                        break
+                    self._pop(first)
+                    self._pop(second)
+                    pairs.append((first, second))
+                    self.widened += 1
+                    i += 2
+                else:
+                    i += 1
+
+        for first, second in pairs:
+            self._record(first, second, now)
+        return pairs
+
+    async def tick(self, now: Optional[float] = None):
+        for first, second in self.pair(now):
+            try:
+                await self.on_match(first, second)
+            except Exception:
+                logger.exception("Match handoff failed")
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.tick()
+            except Exception:
+                logger.exception("Matchmaking tick failed")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "waiting": len(self._tickets),
+            "bands": len(self._bands),
+            "queued": self.queued,
+            "matched": self.matched,
+            "cancelled": self.cancelled,
+            "widened": self.widened,
+            "avg_wait_ms": round(self.total_wait / (2 * self.matched) * 1000, 3) if self.matched else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+            "band_width": self.band_width,
+            "matches_per_second": self.matches_per_second,
+        }
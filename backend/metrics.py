@@ -0,0 +1,239 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Tuple
+
+from pymongo import monitoring
+
+# Prometheus-style metrics without a client library: histograms, counters and
+# callback gauges rendered in the text exposition format by
+# MetricsRegistry.render(). Families take a lock around their own state:
+# MongoCommandTimer records from the pymongo threads Motor runs on, while
+# the event loop records and renders.
+
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count", "lock")
+
+    def __init__(self, buckets, lock):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = lock
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class HistogramFamily:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, label_names: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        self._children: Dict[tuple, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values) -> Histogram:
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = Histogram(self.buckets, self._lock)
+        return child
+
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = [(values, list(child.counts), child.sum, child.count)
+                        for values, child in sorted(self._children.items())]
+        lines = []
+        for values, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(float(bound)) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, values, le)} {cumulative}")
+            labels = _format_labels(self.label_names, values)
+            lines.append(f"{self.name}_sum{labels} {total!r}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class CounterFamily:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *values, amount: float = 1):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.label_names, values)} {_format_value(value)}"
+            for values, value in snapshot
+        ]
+
+
+class Gauge:
+    """Gauge read from a callback at scrape time, so updating it costs nothing."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, read: Callable[[], float]):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def render(self) -> List[str]:
+        return [f"{self.name} {_format_value(self.read())}"]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._families = []
+
+    def register(self, family):
+        self._families.append(family)
+        return family
+
+    def histogram(self, name, help, label_names=(), buckets=DEFAULT_BUCKETS) -> HistogramFamily:
+        return self.register(HistogramFamily(name, help, tuple(label_names), buckets))
+
+    def counter(self, name, help, label_names=()) -> CounterFamily:
+        return self.register(CounterFamily(name, help, tuple(label_names)))
+
+    def gauge(self, name, help, read) -> Gauge:
+        return self.register(Gauge(name, help, read))
+
+    def render(self) -> str:
+        lines = []
+        for family in self._families:
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "FastAPI request latency by route",
+    ("method", "route", "status")
+)
+socketio_event_duration = registry.histogram(
+    "socketio_event_duration_seconds", "Socket.IO event handler latency", ("event",)
+)
+mongodb_command_duration = registry.histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency", ("command",)
+)
+mongodb_command_failures = registry.counter(
+    "mongodb_command_failures_total", "Failed MongoDB commands", ("command",)
+)
+cache_lookups = registry.counter(
+    "cache_lookups_total", "In-process cache lookups", ("cache", "result")
+)
+
+
+class RouteTimingMiddleware:
+    """ASGI middleware recording http_request_duration_seconds.
+
+    Requests are labelled with the route template (``/api/game/records``)
+    rather than the raw path, so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            http_request_duration.labels(
+                scope["method"], route.path if route is not None else "unmatched", str(status)
+            ).observe(time.perf_counter() - started)
+
+
+def instrument_socketio(sio, namespace: str = '/'):
+    """Wrap every registered event handler to record its latency."""
+    for event, handler in list(sio.handlers.get(namespace, {}).items()):
+        sio.handlers[namespace][event] = _timed_handler(event, handler)
+
+
+def _timed_handler(event: str, handler):
+    histogram = socketio_event_duration.labels(event)
+    perf_counter = time.perf_counter
+
+    @functools.wraps(handler)
+    async def timed(*args):
+        started = perf_counter()
+        try:
+            return await handler(*args)
+        finally:
+            histogram.observe(perf_counter() - started)
+    return timed
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """pymongo command listener feeding mongodb_command_duration_seconds."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongodb_command_duration.labels(event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        mongodb_command_duration.labels(event.command_name).observe(event.duration_micros / 1e6)
+        mongodb_command_failures.inc(event.command_name)
+
@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+import achievements
+import leaderboards
+import user_stats
+
+logger = logging.getLogger(__name__)
+
+
+class IndexSpec(NamedTuple):
+    collection: str
+    keys: list
+    unique: bool = False
+    expire_after: Optional[int] = None
+
+    @property
+    def name(self) -> str:
+        return "_".join(f"{field}_{direction}" for field, direction in self.keys)
+
+
+# Every index a query path in server.py relies on
+INDEXES = [
+    IndexSpec("users", [("email", ASCENDING)], unique=True),
+    IndexSpec("users", [("username", ASCENDING)], unique=True),
+    IndexSpec("users", [("id", ASCENDING)], unique=True),
+    IndexSpec("games", [("user_id", ASCENDING), ("score", DESCENDING), ("id", DESCENDING)]),
+    IndexSpec("games", [("user_id", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)]),
+    IndexSpec("achievements", [("user_id", ASCENDING), ("achievement_name", ASCENDING)], unique=True),
+    IndexSpec("user_stats", [("user_id", ASCENDING)], unique=True),
+    IndexSpec("user_stats", [("total_score", DESCENDING)]),
+    IndexSpec("leaderboard_buckets", [("board", ASCENDING), ("user_id", ASCENDING)], unique=True),
+    IndexSpec("leaderboard_buckets", [("board", ASCENDING), ("total_score", DESCENDING)]),
+    # TTL: day and week buckets are deleted once past their expires_at
+    IndexSpec("leaderboard_buckets", [("expires_at", ASCENDING)], expire_after=0),
+]
+
+
+class QueryShape(NamedTuple):
+    endpoint: str
+    collection: str
+    filter: dict
+    sort: Optional[list] = None
+    limit: int = 0
+
+
+# Representative query for every endpoint; verify() explains each of them
+QUERIES = [
+    QueryShape("register", "users", {"email": "a@example.com"}),
+    QueryShape("register", "users", {"username": "a"}),
+    QueryShape("login", "users", {"email": "a@example.com"}),
+    QueryShape("get_me", "users", {"id": "u"}),
+    QueryShape("save_game", "users", {"id": "u"}),
+    QueryShape("save_game", "user_stats", {"user_id": "u"}),
+    QueryShape("save_game", "achievements", {"user_id": "u", "achievement_name": "İlk Vuruş"}),
+    QueryShape("get_records", "games", {"user_id": "u"}, [("score", DESCENDING)], 10),
+    QueryShape("get_game_history", "games", {"user_id": "u"}, [("score", DESCENDING), ("id", DESCENDING)], 21),
+    QueryShape("get_game_history", "games", {"user_id": "u", "mode": "Klasik"},
+               [("date", DESCENDING), ("id", DESCENDING)], 21),
+    QueryShape("get_game_history", "games",
+               {"user_id": "u", "$or": [{"date": {"$lt": "d"}}, {"date": "d", "id": {"$lt": "g"}}]},
+               [("date", DESCENDING), ("id", DESCENDING)], 21),
+    QueryShape("export_games", "games", {"user_id": "u"}, [("date", ASCENDING), ("id", ASCENDING)]),
+    QueryShape("get_leaderboard", "user_stats", {}, [("total_score", DESCENDING)], 10),
+    QueryShape("get_leaderboard", "leaderboard_buckets", {"board": "week:2026-W42"}, [("total_score", DESCENDING)], 10),
+    QueryShape("save_game", "leaderboard_buckets", {"board": "day:2026-10-17", "user_id": "u"}),
+    QueryShape("get_achievements", "achievements", {"user_id": "u"}),
+]
+
+
+# Schema migrations, applied once each in order and recorded in db.migrations
+async def _dedupe_achievements(db):
+    removed = await achievements.remove_duplicates(db)
+    logger.info(f"Removed {removed} duplicate achievements")
+
+
+async def _backfill_user_stats(db):
+    await user_stats.rebuild(db)
+
+
+async def _replace_games_score_index(db):
+    # (user_id, score) became (user_id, score, id) for keyset pagination;
+    # build the replacement before dropping the old one
+    await db.games.create_index([("user_id", ASCENDING), ("score", DESCENDING), ("id", DESCENDING)])
+    try:
+        await db.games.drop_index("user_id_1_score_-1")
+    except OperationFailure:
+        pass  # never created
+
+
+async def _backfill_leaderboard_buckets(db):
+    await leaderboards.rebuild(db)
+
+
+MIGRATIONS = [
+    (1, "dedupe_achievements", _dedupe_achievements),
+    (2, "backfill_user_stats", _backfill_user_stats),
+    (3, "replace_games_score_index", _replace_games_score_index),
+    (4, "backfill_leaderboard_buckets", _backfill_leaderboard_buckets),
+]
+
+
+async def _report_build_progress(db, spec: IndexSpec, interval: float):
+    namespace = f"{db.name}.{spec.collection}"
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # The filter goes in the command document itself; as the
+            # command's value it would be ignored and match every operation
+            ops = await db.client.admin.command(
+                {"currentOp": 1, "ns": namespace, "command.createIndexes": {"$exists": True}}
+            )
+        except OperationFailure:
+            return
+        for op in ops.get("inprog", []):
+            progress = op.get("progress")
+            if progress:
+                logger.info(
+                    f"Building {spec.collection}.{spec.name}: "
+                    f"{progress.get('done')}/{progress.get('total')} ({op.get('msg', '')})"
+                )
+
+
+async def ensure_indexes(db, progress_interval: float = 5.0) -> List[str]:
+    """Create every index in INDEXES; a no-op for the ones that already exist."""
+    created = []
+    for number, spec in enumerate(INDEXES, start=1):
+        started = time.perf_counter()
+        reporter = asyncio.create_task(_report_build_progress(db, spec, progress_interval))
+        try:
+            options = {"unique": spec.unique}
+            if spec.expire_after is not None:
+                options["expireAfterSeconds"] = spec.expire_after
+            name = await db[spec.collection].create_index(spec.keys, **options)
+        except (DuplicateKeyError, OperationFailure) as e:
+            logger.error(f"Index {number}/{len(INDEXES)} {spec.collection}.{spec.name} failed: {e}")
+            continue
+        finally:
+            reporter.cancel()
+        created.append(f"{spec.collection}.{name}")
+        logger.info(
+            f"Index {number}/{len(INDEXES)} {spec.collection}.{name} ready "
+            f"in {(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+    return created
+
+
+async def migrate(db) -> List[str]:
+    applied = []
+    for version, name, migration in MIGRATIONS:
+        try:
+            # Claim the migration so concurrent workers don't run it twice
+            await db.migrations.insert_one({
+                "_id": version,
+                "name": name,
+                "started_at": datetime.now(timezone.utc).isoformat()
+            })
+        except DuplicateKeyError:
+            continue
+        logger.info(f"Applying migration {version} {name}")
+        try:
+            await migration(db)
+        except Exception:
+            await db.migrations.delete_one({"_id": version})
+            raise
+        await db.migrations.update_one(
+            {"_id": version},
+            {"$set": {"finished_at": datetime.now(timezone.utc).isoformat()}}
+        )
+        applied.append(name)
+    return applied
+
+
+async def run(db):
+    await migrate(db)
+    await ensure_indexes(db)
+
+
+def _plan_stages(plan: dict) -> List[str]:
+    stages = [plan.get("stage")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages.extend(_plan_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return [stage for stage in stages if stage]
+
+
+async def explain(db, query: QueryShape) -> List[str]:
+    command = {"find": query.collection, "filter": query.filter}
+    if query.sort:
+        command["sort"] = dict(query.sort)
+    if query.limit:
+        command["limit"] = query.limit
+    result = await db.command("explain", command, verbosity="queryPlanner")
+    return _plan_stages(result["queryPlanner"]["winningPlan"])
+
+
+async def verify(db) -> List[str]:
+    """Explain every query in QUERIES; returns the ones not served by an index."""
+    problems = []
+    for query in QUERIES:
+        stages = await explain(db, query)
+        # The empty-filter leaderboard query is fine as long as the sort is indexed
+        if "COLLSCAN" in stages or "SORT" in stages or "IXSCAN" not in stages:
+            problems.append(f"{query.endpoint}: {query.collection} {query.filter} -> {stages}")
+    return problems
+
+
+async def _main(command: str) -> int:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        if command in ("migrate", "all"):
+            print(f"migrations applied: {await migrate(db)}")
+        if command in ("indexes", "all"):
+            print(f"indexes ready: {await ensure_indexes(db)}")
+        if command in ("verify", "all"):
+            problems = await verify(db)
+            for problem in problems:
+                print(f"NOT INDEXED {problem}")
+            print(f"{len(QUERIES) - len(problems)}/{len(QUERIES)} queries use an index")
+            return 1 if problems else 0
+    finally:
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    # Usage: python migrations.py [migrate|indexes|verify|all]
+    command = sys.argv[1] if len(sys.argv) > 1 else "all"
+    if command not in ("migrate", "indexes", "verify", "all"):
+        print("Usage: python migrations.py [migrate|indexes|verify|all]")
+        sys.exit(1)
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(_main(command)))
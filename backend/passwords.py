@@ -0,0 +1,93 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+
+class PasswordServiceBusy(Exception):
+    pass
+
+
+class _Timing:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class PasswordService:
+    """bcrypt hashing/verification on a bounded thread pool.
+
+    bcrypt releases the GIL, so running it in worker threads keeps the event
+    loop (and every Socket.IO handler) responsive. At most ``max_pending``
+    operations may be queued or running; beyond that calls fail fast with
+    PasswordServiceBusy instead of piling up behind a login storm.
+    """
+
+    def __init__(self, context: CryptContext, workers: int = 4, max_pending: int = 64):
+        self.context = context
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._pending = 0
+        self.rejected = 0
+        self.wait = _Timing()
+        self.hash_timing = _Timing()
+        self.verify_timing = _Timing()
+
+    async def _run(self, timing: _Timing, fn, *args):
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordServiceBusy()
+        self._pending += 1
+        queued_at = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            result = fn(*args)
+            return started, time.perf_counter(), result
+
+        try:
+            loop = asyncio.get_running_loop()
+            started, finished, result = await loop.run_in_executor(self._executor, job)
+        finally:
+            self._pending -= 1
+        self.wait.observe(started - queued_at)
+        timing.observe(finished - started)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.hash_timing, self.context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(self.verify_timing, self.context.verify, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "rejected": self.rejected,
+            "queue_wait": self.wait.snapshot(),
+            "hash": self.hash_timing.snapshot(),
+            "verify": self.verify_timing.snapshot(),
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from sortedcontainers import SortedList
+
+import user_stats
+
+logger = logging.getLogger(__name__)
+
+# Players a refresh handles between yields to the event loop (about 3 ms)
+REFRESH_SLICE = 1000
+
+
+def _player(doc: dict) -> dict:
+    return {
+        "username": doc.get("username", ""),
+        "total_score": doc.get("total_score", 0),
+        "best_score": doc.get("best_score", 0),
+        "games_played": doc.get("games_played", 0),
+    }
+
+
+class RankIndex:
+    """In-memory all-time ranking over user_stats, for /api/leaderboard/me.
+
+    Players are kept in a SortedList keyed by (-total_score, user_id), so a
+    player's position, the rank of a score and the players around a position
+    are O(log n) lookups. Saves update it through ``record``; ``load`` reads
+    the whole user_stats collection at startup and again every
+    ``refresh_interval`` seconds (0 = never), which also picks up saves made
+    by other workers. The first load builds the index in one go; refreshes
+    only re-key the players whose stats changed and yield to the event loop
+    between batches, so a large index never stalls it. Players missing from
+    the index (registered on another worker since the last load) are read
+    on demand with ``ensure``.
+
+    ``collection`` returns the user_stats collection when called, so the
+    index follows whatever database the server is using.
+
+    Ties share a rank: a player's rank is 1 + the number of players with a
+    higher total_score.
+    """
+
+    def __init__(self, collection: Callable[[], object], refresh_interval: float = 60.0):
+        self.collection = collection
+        self.refresh_interval = refresh_interval
+        self.loads = 0
+        self.last_load_ms = 0.0
+        self.last_changes = 0
+        self.records = 0
+        self.misses = 0
+        self._players: Dict[str, dict] = {}
+        # Load that last saw each player in user_stats, to find the ones gone
+        self._seen: Dict[str, int] = {}
+        self._order: SortedList = SortedList()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._players
+
+    @staticmethod
+    def _key(user_id: str, player: dict) -> Tuple[int, str]:
+        return -player["total_score"], user_id
+
+    def set(self, user_id: str, player: dict):
+        old = self._players.get(user_id)
+        if old is not None:
+            self._order.remove(self._key(user_id, old))
+        player = _player(player)
+        self._players[user_id] = player
+        self._seen.setdefault(user_id, self.loads)
+        self._order.add(self._key(user_id, player))
+
+    def discard(self, user_id: str):
+        player = self._players.pop(user_id, None)
+        self._seen.pop(user_id, None)
+        if player is not None:
+            self._order.remove(self._key(user_id, player))
+
+    def record(self, user_id: str, totals: dict):
+        """Apply the totals of newly saved games (see user_stats.summarize_games)."""
+        player = self._players.get(user_id)
+        if player is None:
+            return  # picked up by ensure or the next load
+        self.records += 1
+        self.set(user_id, {
+            **player,
+            "total_score": player["total_score"] + totals["total_score"],
+            "games_played": player["games_played"] + totals["games_played"],
+            "best_score": max(player["best_score"], totals["best_score"]),
+        })
+
+    def rank_of_score(self, total_score: int) -> int:
+        return self._order.bisect_left((-total_score, "")) + 1
+
+    def rank(self, user_id: str) -> Optional[int]:
+        player = self._players.get(user_id)
+        return self.rank_of_score(player["total_score"]) if player is not None else None
+
+    def _entry(self, user_id: str) -> dict:
+        player = self._players[user_id]
+        return {"rank": self.rank_of_score(player["total_score"]), **player}
+
+    def around(self, user_id: str, k: int) -> Optional[dict]:
+        """The player's rank entry and up to ``k`` players above and below."""
+        player = self._players.get(user_id)
+        if player is None:
+            return None
+        position = self._order.index(self._key(user_id, player))
+        above = self._order.islice(max(0, position - k), position)
+        below = self._order.islice(position + 1, position + 1 + k)
+        return {
+            "total_players": len(self._order),
+            "me": self._entry(user_id),
+            "above": [self._entry(other) for _, other in above],
+            "below": [self._entry(other) for _, other in below],
+        }
+
+    async def ensure(self, user_id: str) -> bool:
+        if user_id in self._players:
+            return True
+        self.misses += 1
+        player = await self.collection().find_one({"user_id": user_id}, user_stats.STATS_PROJECTION)
+        if player is None:
+            return False
+        self.set(user_id, player)
+        return True
+
+    async def load(self, batch_size: int = 10000):
+        started = time.perf_counter()
+        projection = {**user_stats.STATS_PROJECTION, "user_id": 1}
+        cursor = self.collection().find({}, projection).batch_size(batch_size)
+        if not self._players:
+            players = {}
+            async for doc in cursor:
+                players[doc["user_id"]] = _player(doc)
+            self._players = players
+            self._seen = dict.fromkeys(players, self.loads)
+            self._order = SortedList(self._key(user_id, player) for user_id, player in players.items())
+            self.last_changes = len(players)
+        else:
+            self.last_changes = await self._refresh(cursor)
+        self.loads += 1
+        self.last_load_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"Loaded {len(self._players)} players into the rank index in {self.last_load_ms:.0f} ms "
+                    f"({self.last_changes} changed)")
+
+    async def _refresh(self, cursor) -> int:
+        # Stamping this load into _seen overwrites existing keys, so unlike
+        # collecting the ids in a new set it never rehashes a million entries
+        # in one go
+        load = self.loads
+        changes = 0
+        read = 0
+        async for doc in cursor:
+            user_id = doc["user_id"]
+            player = _player(doc)
+            if self._players.get(user_id) != player:
+                self.set(user_id, player)
+                changes += 1
+            self._seen[user_id] = load
+            read += 1
+            if read % REFRESH_SLICE == 0:
+                await asyncio.sleep(0)
+        # Players gone from user_stats; ones registered meanwhile come back
+        # through ensure
+        user_ids = list(self._seen)
+        for start in range(0, len(user_ids), REFRESH_SLICE):
+            for user_id in user_ids[start:start + REFRESH_SLICE]:
+                if self._seen.get(user_id, load) < load:
+                    self.discard(user_id)
+                    changes += 1
+            await asyncio.sleep(0)
+        return changes
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.load()
+            except Exception:
+                logger.exception("Rank index refresh failed")
+
+    def start(self):
+        if self._task is None and self.refresh_interval > 0:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "players": len(self._players),
+            "loads": self.loads,
+            "last_load_ms": round(self.last_load_ms, 3),
+            "last_changes": self.last_changes,
+            "records": self.records,
+            "misses": self.misses,
+            "refresh_interval": self.refresh_interval,
+        }
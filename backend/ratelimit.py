@@ -0,0 +1,119 @@
+import functools
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+socketio_events_dropped = metrics.registry.counter(
+    "socketio_events_dropped_total", "Socket.IO events dropped by the per-sid rate limit", ("event",)
+)
+
+
+def parse_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    """"player_hit=50/100,create_room=1" -> {event: (per second, burst)}.
+
+    The burst defaults to the rate; a rate of 0 removes the event's limit.
+    """
+    limits = {}
+    for item in spec.split(','):
+        if '=' not in item:
+            continue
+        event, value = item.split('=', 1)
+        rate, _, burst = value.partition('/')
+        try:
+            limits[event.strip()] = (float(rate), float(burst or rate))
+        except ValueError:
+            logger.warning("Ignoring bad rate limit %r", item)
+    return limits
+
+
+class EventRateLimiter:
+    """Token bucket per sid and per Socket.IO event.
+
+    Each (sid, event) pair may send ``burst`` events at once and ``rate`` per
+    second after that. Buckets are created on a sid's first limited event,
+    refilled lazily when it sends the next one and dropped on disconnect
+    with ``forget``, so there is no background task and a check is a couple
+    of dict lookups. Events without a limit pass straight through.
+    """
+
+    DEFAULT_LIMITS = {
+        # The game client coalesces hits into player_hits every 50 ms
+        "player_hit": "50/100",
+        "player_hits": "40/80",
+        "create_room": "1/5",
+        "join_room": "2/10",
+        "find_match": "1/5",
+        "cancel_match": "2/10",
+        "start_game": "2/5",
+        "game_end": "2/5",
+        "watch_match": "2/10",
+        "stop_watching": "2/10",
+    }
+
+    def __init__(self, limits: Dict[str, Tuple[float, float]],
+                 clock: Callable[[], float] = time.monotonic):
+        self.limits = {event: limit for event, limit in limits.items() if limit[0] > 0}
+        self.clock = clock
+        self.allowed: Dict[str, int] = {event: 0 for event in self.limits}
+        self.dropped: Dict[str, int] = {event: 0 for event in self.limits}
+        self._buckets: Dict[str, Dict[str, List[float]]] = {}
+
+    @classmethod
+    def from_env(cls) -> 'EventRateLimiter':
+        defaults = ",".join(f"{event}={limit}" for event, limit in cls.DEFAULT_LIMITS.items())
+        return cls(parse_limits(defaults) | parse_limits(os.environ.get('SOCKETIO_RATE_LIMITS', '')))
+
+    def allow(self, sid: str, event: str, now: Optional[float] = None) -> bool:
+        limit = self.limits.get(event)
+        if limit is None:
+            return True
+        rate, burst = limit
+        now = self.clock() if now is None else now
+        buckets = self._buckets.get(sid)
+        if buckets is None:
+            buckets = self._buckets[sid] = {}
+        bucket = buckets.get(event)
+        if bucket is None:
+            bucket = buckets[event] = [burst, now]
+        else:
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        if bucket[0] >= 1.0:
+            bucket[0] -= 1.0
+            self.allowed[event] += 1
+            return True
+        self.dropped[event] += 1
+        socketio_events_dropped.inc(event)
+        return False
+
+    def forget(self, sid: str):
+        self._buckets.pop(sid, None)
+
+    def install(self, sio, namespace: str = '/'):
+        """Wrap every limited event handler so excess events never reach it."""
+        for event, handler in list(sio.handlers.get(namespace, {}).items()):
+            if event in self.limits:
+                sio.handlers[namespace][event] = self._limited(event, handler)
+
+    def _limited(self, event: str, handler):
+        allow = self.allow
+
+        @functools.wraps(handler)
+        async def limited(sid, *args):
+            if not allow(sid, event):
+                return None
+            return await handler(sid, *args)
+        return limited
+
+    def stats(self) -> dict:
+        return {
+            "sids": len(self._buckets),
+            "limits": {event: {"rate": rate, "burst": burst} for event, (rate, burst) in self.limits.items()},
+            "allowed": dict(self.allowed),
+            "dropped": dict(self.dropped),
+        }
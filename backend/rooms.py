@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+WAITING = 'waiting'
+PLAYING = 'playing'
+FINISHED = 'finished'
+
+
+def spectator_room(room_code: str) -> str:
+    return f"{room_code}:watch"
+
+
+@dataclass(slots=True)
+class Room:
+    code: str
+    player1: Optional[str]
+    player1_username: str
+    player2: Optional[str] = None
+    player2_username: Optional[str] = None
+    player1_score: int = 0
+    player2_score: int = 0
+    # Logged-in players' ids, for recording the match result
+    player1_user_id: Optional[str] = None
+    player2_user_id: Optional[str] = None
+    # Scores last broadcast to the opponent (see score_ticker)
+    player1_reported: int = 0
+    player2_reported: int = 0
+    game_started: bool = False
+    finished: bool = False
+    state_since: float = field(default_factory=time.monotonic)
+    # Viewers in the spectator_room and when they last got a score update
+    spectators: int = 0
+    spectators_reported_at: float = 0.0
+
+    @property
+    def spectator_room(self) -> str:
+        # Players are in the Socket.IO room named after the code, viewers here
+        return spectator_room(self.code)
+
+    @property
+    def state(self) -> str:
+        if self.finished:
+            return FINISHED
+        if self.game_started:
+            return PLAYING
+        return WAITING
+
+    def start(self):
+        self.game_started = True
+        self.finished = False
+        self.player1_score = 0
+        self.player2_score = 0
+        self.player1_reported = 0
+        self.player2_reported = 0
+        self.state_since = time.monotonic()
+
+    def finish(self):
+        self.finished = True
+        self.state_since = time.monotonic()
+
+    def opponent_of(self, sid: str) -> Optional[str]:
+        if sid == self.player1:
+            return self.player2
+        if sid == self.player2:
+            return self.player1
+        return None
+
+    def scores(self) -> dict:
+        return {'player1_score': self.player1_score, 'player2_score': self.player2_score}
+
+    def snapshot(self) -> dict:
+        return {
+            'room_code': self.code,
+            'state': self.state,
+            'player1_username': self.player1_username,
+            'player2_username': self.player2_username,
+            **self.scores()
+        }
+
+    def final_data(self) -> dict:
+        return {
+            'player1_score': self.player1_score,
+            'player2_score': self.player2_score,
+            'player1_username': self.player1_username,
+            'player2_username': self.player2_username
+        }
+
+
+class RoomRegistry:
+    """In-memory game rooms keyed by room code, with a sid -> room code index.
+
+    Every lookup a Socket.IO handler needs (by code or by the calling sid) is a
+    single dict access, so disconnect no longer scans all rooms.
+    """
+
+    def __init__(self):
+        self._rooms: Dict[str, Room] = {}
+        self._by_sid: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._rooms)
+
+    def __contains__(self, room_code: str) -> bool:
+        return room_code in self._rooms
+
+    def __iter__(self) -> Iterator[Room]:
+        return iter(list(self._rooms.values()))
+
+    def new_code(self) -> str:
+        while True:
+            room_code = str(uuid.uuid4())[:6].upper()
+            if room_code not in self._rooms:
+                return room_code
+
+    def create(self, sid: str, username: str, room_code: Optional[str] = None,
+               user_id: Optional[str] = None) -> Room:
+        room = Room(code=room_code or self.new_code(), player1=sid, player1_username=username,
+                    player1_user_id=user_id)
+        self._rooms[room.code] = room
+        self._by_sid[sid] = room.code
+        return room
+
+    def join(self, room: Room, sid: str, username: str, user_id: Optional[str] = None):
+        room.player2 = sid
+        room.player2_username = username
+        room.player2_user_id = user_id
+        room.state_since = time.monotonic()
+        self._by_sid[sid] = room.code
+
+    def get(self, room_code: str) -> Optional[Room]:
+        return self._rooms.get(room_code)
+
+    def room_for_sid(self, sid: str) -> Optional[Room]:
+        room_code = self._by_sid.get(sid)
+        if room_code is None:
+            return None
+        return self._rooms.get(room_code)
+
+    def remove(self, room_code: str) -> Optional[Room]:
+        room = self._rooms.pop(room_code, None)
+        if room is None:
+            return None
+        for sid in (room.player1, room.player2):
+            if sid is not None and self._by_sid.get(sid) == room_code:
+                del self._by_sid[sid]
+        return room
+
+    def counts(self) -> Dict[str, int]:
+        counts = {WAITING: 0, PLAYING: 0, FINISHED: 0}
+        for room in self._rooms.values():
+            counts[room.state] += 1
+        return counts
+
+
+class RoomReaper:
+    """Periodically evicts rooms that stayed too long in one state.
+
+    ``ttls`` maps a room state (waiting/playing/finished) to the number of
+    seconds a room may remain in it. Evicted rooms are handed to ``on_evict``
+    so the server can tell any sockets still attached.
+    """
+
+    def __init__(self, registry: RoomRegistry, ttls: Dict[str, float], interval: float,
+                 on_evict: Optional[Callable[[Room], Awaitable[None]]] = None):
+        self.registry = registry
+        self.ttls = ttls
+        self.interval = interval
+        self.on_evict = on_evict
+        self.evicted = {WAITING: 0, PLAYING: 0, FINISHED: 0}
+        self.sweeps = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def sweep(self, now: Optional[float] = None) -> List[Room]:
+        now = time.monotonic() if now is None else now
+        expired = [
+            room for room in self.registry
+            if now - room.state_since >= self.ttls[room.state]
+        ]
+        for room in expired:
+            self.evicted[room.state] += 1
+            self.registry.remove(room.code)
+        self.sweeps += 1
+        return expired
+
+    async def notify(self, rooms: List[Room]):
+        """Hand evicted rooms to ``on_evict``; one failing doesn't skip the rest."""
+        if not self.on_evict:
+            return
+        for room in rooms:
+            try:
+                await self.on_evict(room)
+            except Exception:
+                logger.exception(f"Closing expired room {room.code} failed")
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                expired = self.sweep()
+            except Exception:
+                logger.exception("Room sweep failed")
+                continue
+            # The rooms are already out of the registry, so this is their only
+            # chance to tell their sockets and release their directory entries
+            await self.notify(expired)
+            if expired:
+                logger.info(f"Evicted {len(expired)} expired rooms, {len(self.registry)} remaining")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "rooms": self.registry.counts(),
+            "total_rooms": len(self.registry),
+            "evicted": dict(self.evicted),
+            "sweeps": self.sweeps,
+            "ttls": dict(self.ttls),
+        }
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+
+from rooms import Room
+
+logger = logging.getLogger(__name__)
+
+
+class ScoreTicker:
+    """Coalesces score changes into at most one broadcast per room per tick.
+
+    Handlers call ``mark`` after changing a room's scores; a single background
+    task wakes ``hz`` times per second and hands every room marked since the
+    previous tick to ``flush``. Idle rooms cost nothing per tick.
+    """
+
+    def __init__(self, hz: float, flush: Callable[[Room], Awaitable[None]]):
+        self.hz = hz
+        self.interval = 1.0 / hz if hz > 0 else 0.0
+        self.flush = flush
+        self.ticks = 0
+        self.hits = 0
+        self.flushes = 0
+        self._dirty: Dict[str, Room] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.hz > 0
+
+    async def mark(self, room: Room, hits: int = 1):
+        self.hits += hits
+        if not self.enabled:
+            # Ticking disabled: broadcast straight away
+            self.flushes += 1
+            await self.flush(room)
+            return
+        self._dirty[room.code] = room
+
+    async def flush_room(self, room: Room):
+        """Broadcast a room's pending update now instead of on the next tick."""
+        if self._dirty.pop(room.code, None) is not None:
+            self.flushes += 1
+            await self.flush(room)
+
+    def defer(self, room: Room):
+        """Hand a room to ``flush`` again on the next tick without counting a hit."""
+        if self.enabled:
+            self._dirty[room.code] = room
+
+    def discard(self, room_code: str):
+        self._dirty.pop(room_code, None)
+
+    async def tick(self):
+        self.ticks += 1
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, {}
+        for room in dirty.values():
+            self.flushes += 1
+            try:
+                await self.flush(room)
+            except Exception:
+                # The other rooms still get this tick's update
+                logger.exception("Score flush for room %s failed", room.code)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        while True:
+            deadline += self.interval
+            delay = deadline - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # Fell behind; don't try to catch up with a burst of ticks
+                deadline = loop.time()
+            try:
+                await self.tick()
+            except Exception:
+                logger.exception("Score tick failed")
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "hz": self.hz,
+            "ticks": self.ticks,
+            "hits": self.hits,
+            "flushes": self.flushes,
+            "pending_rooms": len(self._dirty),
+        }
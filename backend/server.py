@@ -1,4 +1,5 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response, status
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -7,40 +8,116 @@ import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr, ConfigDict
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Set, Tuple
 import uuid
 from datetime import datetime, timezone, timedelta
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 import asyncio
+import functools
+import time
 from dotenv import load_dotenv
+import user_stats
+import leaderboards
+import rankings
+import ratelimit
+import achievements
+import game_history
+import migrations
+import metrics
+from write_behind import WriteBehindQueue, WriteBehindFull
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from passwords import PasswordService, PasswordServiceBusy
+from rooms import RoomRegistry, RoomReaper, WAITING, PLAYING, FINISHED, spectator_room
+from score_ticker import ScoreTicker
+from match_clock import TimerWheel
+from matchmaking import Matchmaker
+import cluster
+import log_setup
+from caches import TTLCache, ResponseCache, etag_matches
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Logging goes through a bounded queue drained by a background thread, so
+# handlers never block the event loop on stream I/O
+log_setup.configure_logging(
+    level=logging.getLevelName(os.environ.get('LOG_LEVEL', 'INFO').upper()),
+    max_queue=int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+)
+logger = logging.getLogger(__name__)
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[metrics.MongoCommandTimer()])
 db = client[os.environ['DB_NAME']]
 
 # Security
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_service = PasswordService(
+    pwd_context,
+    workers=int(os.environ.get('PASSWORD_WORKERS', '4')),
+    max_pending=int(os.environ.get('PASSWORD_QUEUE_LIMIT', '64'))
+)
 SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60  # 30 days
 
 security = HTTPBearer()
 
+# Verified token -> user id, so repeat requests skip jwt.decode; entries never
+# outlive the token's exp
+token_cache = TTLCache(
+    'tokens',
+    maxsize=int(os.environ.get('TOKEN_CACHE_SIZE', '10000')),
+    ttl=float(os.environ.get('TOKEN_CACHE_TTL', '300'))
+)
+# Per-user profile and top records for /api/user/me and /api/game/records.
+# Game saves on this worker update them in place; the ttl bounds how stale
+# they can get when another worker writes
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', '30'))
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', '10000'))
+profile_cache = TTLCache('user_profiles', maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+records_cache = TTLCache('game_records', maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+RECORDS_LIMIT = 10
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+GAME_SYNC_MAX_BATCH = int(os.environ.get('GAME_SYNC_MAX_BATCH', '100'))
+# All-time ranks for /api/leaderboard/me; reloaded from user_stats periodically
+rank_index = rankings.RankIndex(
+    lambda: db.user_stats, refresh_interval=float(os.environ.get('RANK_INDEX_REFRESH_INTERVAL', '60'))
+)
+# Rendered /api/leaderboard and /api/achievements bodies, served with ETags;
+# game saves invalidate them
+leaderboard_responses = ResponseCache(
+    'leaderboard', maxsize=64, ttl=float(os.environ.get('LEADERBOARD_CACHE_TTL', '5'))
+)
+achievement_responses = ResponseCache('achievements', maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
 # Socket.IO server
+# SOCKETIO_MESSAGE_QUEUE=redis://host:6379/0 lets several workers share rooms
+# (needs the redis package; the room directory is kept in Mongo)
+client_manager, room_directory = cluster.from_env(os.environ.get('SOCKETIO_MESSAGE_QUEUE'), db)
+# SOCKETIO_SERIALIZER=msgpack switches to binary packets (needs the msgpack
+# package); the frontend must be built with REACT_APP_SOCKETIO_PARSER=msgpack
+# to match, as the two formats can't be mixed on one server
+SOCKETIO_SERIALIZER = os.environ.get('SOCKETIO_SERIALIZER', 'default')
+# Score updates as a bare number / [player1, player2] list instead of dicts
+COMPACT_SCORES = os.environ.get('SOCKETIO_COMPACT_SCORES', '').lower() in ('1', 'true', 'yes')
 sio = socketio.AsyncServer(
     async_mode='asgi',
+    client_manager=client_manager,
+    serializer=SOCKETIO_SERIALIZER,
     cors_allowed_origins='*',
-    logger=True,
-    engineio_logger=True
+    # engine.io logs every packet at INFO; keep it off unless debugging transports
+    logger=log_setup.library_logger('socketio.server', os.environ.get('SOCKETIO_LOG_LEVEL', 'WARNING')),
+    engineio_logger=log_setup.library_logger('engineio.server', os.environ.get('ENGINEIO_LOG_LEVEL', 'ERROR'))
 )
+# Per-event levels and sampling, see log_setup.EventLoggers
+event_log = log_setup.EventLoggers.from_env('socketio.events')
 
 # FastAPI app
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Socket.IO app
 socket_app = socketio.ASGIApp(sio, app)
@@ -53,13 +130,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-# Logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+app.add_middleware(metrics.RouteTimingMiddleware)
 
 # Models
 class UserRegister(BaseModel):
@@ -71,14 +142,20 @@ class UserLogin(BaseModel):
     email: EmailStr
     password: str
 
-class User(BaseModel):
+class UserSummary(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str
     username: str
     email: str
     total_score: int = 0
+
+class User(UserSummary):
     created_at: str
 
+class AuthResponse(BaseModel):
+    token: str
+    user: UserSummary
+
 class GameRecord(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str
@@ -95,6 +172,33 @@ class Achievement(BaseModel):
     achievement_name: str
     unlocked_at: str
 
+class GamePage(BaseModel):
+    items: List[GameRecord]
+    next_cursor: Optional[str] = None
+
+class GameSave(BaseModel):
+    mode: str = Field(min_length=1, max_length=64)
+    score: int = Field(ge=0)
+    duration: int = Field(ge=0)
+
+class GameSaveResponse(BaseModel):
+    message: str
+    game_id: str
+    achievements: List[Achievement]
+
+class GameResult(GameSave):
+    client_id: str = Field(min_length=1, max_length=64)  # idempotency key
+    played_at: Optional[datetime] = None
+
+class GameBatch(BaseModel):
+    games: List[GameResult] = Field(min_length=1, max_length=GAME_SYNC_MAX_BATCH)
+
+class GameSyncResponse(BaseModel):
+    message: str
+    saved: List[str]
+    duplicates: List[str]
+    achievements: List[Achievement]
+
 class LeaderboardEntry(BaseModel):
     model_config = ConfigDict(extra="ignore")
     username: str
@@ -102,12 +206,33 @@ class LeaderboardEntry(BaseModel):
     best_score: int
     games_played: int
 
+class RankEntry(LeaderboardEntry):
+    rank: int
+
+class RankNeighbourhood(BaseModel):
+    total_players: int
+    me: RankEntry
+    above: List[RankEntry]
+    below: List[RankEntry]
+
+# Mongo projections: only the fields the response models above need
+USER_PROJECTION = {"_id": 0, "id": 1, "username": 1, "email": 1, "total_score": 1, "created_at": 1}
+LOGIN_PROJECTION = {"_id": 0, "id": 1, "username": 1, "email": 1, "total_score": 1, "password": 1}
+GAME_RECORD_PROJECTION = {"_id": 0, "id": 1, "user_id": 1, "mode": 1, "score": 1, "duration": 1, "date": 1}
+ACHIEVEMENT_PROJECTION = {"_id": 0, "id": 1, "user_id": 1, "achievement_name": 1, "unlocked_at": 1}
+
 # Helper functions
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def hash_password(password: str) -> str:
+    try:
+        return await password_service.hash(password)
+    except PasswordServiceBusy:
+        raise HTTPException(status_code=503, detail="Sunucu meşgul, lütfen tekrar deneyin")
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    try:
+        return await password_service.verify(plain_password, hashed_password)
+    except PasswordServiceBusy:
+        raise HTTPException(status_code=503, detail="Sunucu meşgul, lütfen tekrar deneyin")
 
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
@@ -116,38 +241,59 @@ def create_access_token(data: dict) -> str:
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def user_id_from_token(token: str) -> Optional[str]:
+    user_id = token_cache.get(token)
+    if user_id is not None:
+        return user_id
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
+        user_id = payload.get("sub")
         if user_id is None:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+            return None
+        expires = payload.get("exp")
+        token_cache.set(token, user_id, ttl=expires - time.time() if expires is not None else None)
         return user_id
     except JWTError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+        return None
     except Exception:
+        return None
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    user_id = user_id_from_token(credentials.credentials)
+    if user_id is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    return user_id
+
+async def load_profile(user_id: str) -> Optional[dict]:
+    user = profile_cache.get(user_id)
+    if user is None:
+        user = await db.users.find_one({"id": user_id}, USER_PROJECTION)
+        if user:
+            profile_cache.set(user_id, user)
+    return user
 
 # API Routes
 @app.get("/api/")
 async def root():
     return {"message": "Yiğit'e Vurma Oyunu API"}
 
-@app.post("/api/auth/register")
+async def registration_conflict(user_data: UserRegister) -> Optional[str]:
+    if await db.users.find_one({"email": user_data.email}, {"_id": 1}):
+        return "Email zaten kayıtlı"
+    if await db.users.find_one({"username": user_data.username}, {"_id": 1}):
+        return "Kullanıcı adı zaten alınmış"
+    return None
+
+@app.post("/api/auth/register", response_model=AuthResponse)
 async def register(user_data: UserRegister):
     # Check if user exists
-    existing_user = await db.users.find_one({"email": user_data.email}, {"_id": 0})
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Email zaten kayıtlı")
-    
-    existing_username = await db.users.find_one({"username": user_data.username}, {"_id": 0})
-    if existing_username:
-        raise HTTPException(status_code=400, detail="Kullanıcı adı zaten alınmış")
+    conflict = await registration_conflict(user_data)
+    if conflict:
+        raise HTTPException(status_code=400, detail=conflict)
     
     # Create user
     user_id = str(uuid.uuid4())
-    hashed_pw = hash_password(user_data.password)
+    hashed_pw = await hash_password(user_data.password)
     user_doc = {
         "id": user_id,
         "username": user_data.username,
@@ -156,7 +302,16 @@ async def register(user_data: UserRegister):
         "total_score": 0,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
-    await db.users.insert_one(user_doc)
+    try:
+        await db.users.insert_one(user_doc)
+    except DuplicateKeyError:
+        # A concurrent registration got in after the check; the unique
+        # indexes on email and username turned it away
+        conflict = await registration_conflict(user_data)
+        raise HTTPException(status_code=400, detail=conflict or "Kullanıcı adı zaten alınmış")
+    await user_stats.init_user_stats(db, user_id, user_data.username)
+    rank_index.set(user_id, {"username": user_data.username})
+    leaderboard_responses.invalidate('top')
     
     # Create token
     access_token = create_access_token({"sub": user_id})
@@ -171,10 +326,10 @@ async def register(user_data: UserRegister):
         }
     }
 
-@app.post("/api/auth/login")
+@app.post("/api/auth/login", response_model=AuthResponse)
 async def login(login_data: UserLogin):
-    user = await db.users.find_one({"email": login_data.email}, {"_id": 0})
-    if not user or not verify_password(login_data.password, user["password"]):
+    user = await db.users.find_one({"email": login_data.email}, LOGIN_PROJECTION)
+    if not user or not await verify_password(login_data.password, user["password"]):
         raise HTTPException(status_code=401, detail="Email veya şifre hatalı")
     
     access_token = create_access_token({"sub": user["id"]})
@@ -189,231 +344,765 @@ async def login(login_data: UserLogin):
         }
     }
 
-@app.get("/api/user/me")
+@app.get("/api/user/me", response_model=User)
 async def get_me(user_id: str = Depends(get_current_user)):
-    user = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
+    user = await load_profile(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="Kullanıcı bulunamadı")
     return user
 
-@app.post("/api/game/save")
-async def save_game(game_data: dict, user_id: str = Depends(get_current_user)):
+def invalidate_saved_game(game_doc: dict):
+    # Drop this worker's cached profile, top records, rendered leaderboards and
+    # achievements a save may have changed. Adding the game to the cached
+    # entries instead would count it twice whenever a read refilled them from
+    # Mongo between the save's $inc and this call.
+    user_id = game_doc["user_id"]
+    profile_cache.invalidate(user_id)
+    records_cache.invalidate(user_id)
+    leaderboard_responses.invalidate('top')
+    for board, _ in leaderboards.boards_for(game_doc):
+        leaderboard_responses.invalidate(board)
+    achievement_responses.invalidate(user_id)
+
+def cached_json(request: Request, entry, cache_control: str) -> Response:
+    headers = {"ETag": entry.etag, "Cache-Control": cache_control}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+# Bulk-saved games carry the apply steps already done for them in "applied",
+# so a retried batch or a replayed sync never counts a game twice. Documents
+# without the field were saved one by one and are complete.
+APPLY_STEPS = ("totals", "user_stats", "leaderboards")
+
+def unapplied(games: List[dict], step: str) -> List[dict]:
+    return [game for game in games if step not in game.get("applied", APPLY_STEPS)]
+
+async def mark_applied(games: List[dict], step: str):
+    await db.games.update_many(
+        {"_id": {"$in": [game["_id"] for game in games]}},
+        {"$addToSet": {"applied": step}}
+    )
+    for game in games:
+        game["applied"].append(step)
+
+async def insert_saved_games(docs: List[dict]) -> Tuple[List[dict], Set[int]]:
+    # Inserts games keyed by a stable _id. Returns the games still to apply
+    # (the new ones, plus stored duplicates an earlier attempt didn't finish)
+    # and the indexes of the duplicates.
+    for doc in docs:
+        doc["applied"] = []
+    duplicates: Set[int] = set()
+    try:
+        await db.games.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(error.get("code") != 11000 for error in errors):
+            raise
+        duplicates = {error["index"] for error in errors}
+    pending = [doc for index, doc in enumerate(docs) if index not in duplicates]
+    if duplicates:
+        stored = await db.games.find(
+            {"_id": {"$in": [docs[index]["_id"] for index in duplicates]}, "applied": {"$exists": True}}
+        ).to_list(None)
+        pending += [doc for doc in stored if set(APPLY_STEPS) - set(doc["applied"])]
+    return pending, duplicates
+
+async def apply_saved_games(games: List[dict]) -> Dict[str, List[dict]]:
+    # Totals, stats, leaderboards and achievements for inserted games, one bulk
+    # write per step that hasn't run yet; returns the newly unlocked
+    # achievements per user
+    counted = unapplied(games, "totals")
+    if counted:
+        await db.users.bulk_write([
+            UpdateOne({"id": uid}, {"$inc": {"total_score": totals["total_score"]}})
+            for uid, totals in user_stats.summarize_games(counted).items()
+        ], ordered=False)
+        await mark_applied(counted, "totals")
+    pending = unapplied(games, "user_stats")
+    if pending:
+        per_user = user_stats.summarize_games(pending)
+        await user_stats.record_games(db, per_user)
+        await mark_applied(pending, "user_stats")
+        for uid, totals in per_user.items():
+            rank_index.record(uid, totals)
+    pending = unapplied(games, "leaderboards")
+    if pending:
+        await leaderboards.record_games(db, pending)
+        await mark_applied(pending, "leaderboards")
+    
+    # Unlocking is an upsert, so a repeat is harmless
+    earned: Dict[str, set] = {}
+    for game in games:
+        earned.setdefault(game["user_id"], set()).update(achievements.earned(game))
+    unlocked = await achievements.unlock(db, earned)
+    for game in games:
+        invalidate_saved_game(game)
+    return unlocked
+
+async def flush_game_saves(games: List[dict]):
+    pending, _ = await insert_saved_games(games)
+    if pending:
+        await apply_saved_games(pending)
+
+# Optional write-behind mode for /api/game/save: saves are acknowledged once
+# queued and written in bulk by size or time
+game_save_queue = None
+if os.environ.get('GAME_SAVE_WRITE_BEHIND', '').lower() in ('1', 'true', 'yes'):
+    game_save_queue = WriteBehindQueue(
+        'game_saves',
+        flush_game_saves,
+        batch_size=int(os.environ.get('GAME_SAVE_BATCH_SIZE', '500')),
+        flush_interval=float(os.environ.get('GAME_SAVE_FLUSH_INTERVAL', '0.5')),
+        max_pending=int(os.environ.get('GAME_SAVE_MAX_PENDING', '10000'))
+    )
+
+ONLINE_MODE = "Online Mod"
+
+def match_games(match: dict) -> List[dict]:
+    # One games document per logged-in participant, like /api/game/save makes.
+    # The _id comes from the match, so a retried batch finds its games again.
+    return [
+        {
+            "_id": f"{match['_id']}:{player['user_id']}",
+            "id": str(uuid.uuid4()),
+            "user_id": player["user_id"],
+            "mode": ONLINE_MODE,
+            "score": player["score"],
+            "duration": match["duration"],
+            "date": match["date"],
+            "match_id": match["_id"]
+        }
+        for player in match["players"] if player["user_id"]
+    ]
+
+async def flush_matches(matches: List[dict]):
+    try:
+        await db.matches.insert_many(matches, ordered=False)
+    except BulkWriteError as e:
+        # A retried batch: matches are keyed by id, so re-inserts are dropped
+        if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+            raise
+    # Both players' games, totals and user_stats go through the same bulk path
+    # as queued /api/game/save batches, which skips games already applied
+    games = [game for match in matches for game in match_games(match)]
+    if games:
+        await flush_game_saves(games)
+
+# Finished online matches are written in batches, off the socket handlers
+match_queue = WriteBehindQueue(
+    'matches',
+    flush_matches,
+    batch_size=int(os.environ.get('MATCH_BATCH_SIZE', '200')),
+    flush_interval=float(os.environ.get('MATCH_FLUSH_INTERVAL', '1.0')),
+    max_pending=int(os.environ.get('MATCH_MAX_PENDING', '10000')),
+    put_timeout=0
+)
+
+@app.post("/api/game/save", response_model=GameSaveResponse)
+async def save_game(game_data: GameSave, user_id: str = Depends(get_current_user)):
     game_id = str(uuid.uuid4())
     game_doc = {
         "id": game_id,
         "user_id": user_id,
-        "mode": game_data["mode"],
-        "score": game_data["score"],
-        "duration": game_data["duration"],
+        "mode": game_data.mode,
+        "score": game_data.score,
+        "duration": game_data.duration,
         "date": datetime.now(timezone.utc).isoformat()
     }
+    if game_save_queue is not None:
+        try:
+            await game_save_queue.put({"_id": game_id, **game_doc})
+        except WriteBehindFull:
+            raise HTTPException(status_code=503, detail="Sunucu meşgul, lütfen tekrar deneyin")
+        # Achievements are unlocked when the batch is flushed
+        return {"message": "Oyun kaydedildi", "game_id": game_id, "achievements": []}
+    
     await db.games.insert_one(game_doc)
     
     # Update user total score
     await db.users.update_one(
         {"id": user_id},
-        {"$inc": {"total_score": game_data["score"]}}
+        {"$inc": {"total_score": game_data.score}}
     )
+    await user_stats.record_game(db, user_id, game_data.score)
+    rank_index.record(user_id, user_stats.summarize_games([game_doc])[user_id])
+    # Only a cached username; record_games looks it up otherwise
+    profile = profile_cache.peek(user_id)
+    await leaderboards.record_games(db, [game_doc], {user_id: profile["username"]} if profile else None)
     
     # Check for achievements
-    await check_achievements(user_id, game_data["score"])
+    unlocked = await achievements.check_achievements(db, user_id, game_doc)
+    invalidate_saved_game(game_doc)
     
-    return {"message": "Oyun kaydedildi", "game_id": game_id}
+    return {"message": "Oyun kaydedildi", "game_id": game_id, "achievements": unlocked}
 
-@app.get("/api/game/records")
+@app.post("/api/game/sync", response_model=GameSyncResponse)
+async def sync_games(batch: GameBatch, user_id: str = Depends(get_current_user)):
+    # Games played offline, replayed in one request. The client's key is part
+    # of _id, so a replayed game is a duplicate key and is counted only once;
+    # a duplicate whose first request failed mid-apply is finished now.
+    now = datetime.now(timezone.utc)
+    docs = []
+    keys = set()
+    for result in batch.games:
+        if result.client_id in keys:
+            continue
+        keys.add(result.client_id)
+        played_at = result.played_at or now
+        if played_at.tzinfo is None:
+            played_at = played_at.replace(tzinfo=timezone.utc)
+        docs.append({
+            "_id": f"{user_id}:{result.client_id}",
+            "id": str(uuid.uuid4()),
+            "client_id": result.client_id,
+            "user_id": user_id,
+            "mode": result.mode,
+            "score": result.score,
+            "duration": result.duration,
+            "date": min(played_at, now).astimezone(timezone.utc).isoformat()
+        })
+    
+    pending, duplicates = await insert_saved_games(docs)
+    unlocked = await apply_saved_games(pending) if pending else {}
+    return {
+        "message": "Oyunlar kaydedildi",
+        "saved": [doc["client_id"] for index, doc in enumerate(docs) if index not in duplicates],
+        "duplicates": [docs[index]["client_id"] for index in sorted(duplicates)],
+        "achievements": unlocked.get(user_id, [])
+    }
+
+@app.get("/api/game/records", response_model=List[GameRecord])
 async def get_records(user_id: str = Depends(get_current_user)):
+    records = records_cache.get(user_id)
+    if records is not None:
+        return records
     records = await db.games.find(
         {"user_id": user_id},
-        {"_id": 0}
-    ).sort("score", -1).limit(10).to_list(10)
+        GAME_RECORD_PROJECTION
+    ).sort("score", -1).limit(RECORDS_LIMIT).to_list(RECORDS_LIMIT)
+    records_cache.set(user_id, records)
     return records
 
-@app.get("/api/leaderboard")
-async def get_leaderboard():
-    pipeline = [
-        {
-            "$lookup": {
-                "from": "games",
-                "localField": "id",
-                "foreignField": "user_id",
-                "as": "user_games"
-            }
-        },
-        {
-            "$project": {
-                "_id": 0,
-                "username": 1,
-                "total_score": 1,
-                "best_score": {"$max": "$user_games.score"},
-                "games_played": {"$size": "$user_games"}
-            }
-        },
-        {"$sort": {"total_score": -1}},
-        {"$limit": 10}
-    ]
-    
-    leaderboard = await db.users.aggregate(pipeline).to_list(10)
-    return leaderboard
+@app.get("/api/game/history", response_model=GamePage)
+async def get_game_history(
+    sort: str = Query("date", pattern="^(score|date)$"),
+    mode: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    user_id: str = Depends(get_current_user)
+):
+    # Keyset pagination: pass next_cursor back as ?cursor= for the next page
+    try:
+        return await game_history.page(db, user_id, sort, mode, limit, cursor)
+    except game_history.InvalidCursor:
+        raise HTTPException(status_code=400, detail="Geçersiz sayfa imleci")
+
+@app.get("/api/game/export")
+async def export_games(mode: Optional[str] = None, user_id: str = Depends(get_current_user)):
+    return StreamingResponse(
+        game_history.export_ndjson(db, user_id, mode, batch_size=EXPORT_BATCH_SIZE),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="oyunlar.ndjson"'}
+    )
+
+@app.get("/api/metrics")
+async def get_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/stats/passwords")
+async def get_password_stats():
+    return password_service.stats()
+
+@app.get("/api/stats/game-saves")
+async def get_game_save_stats():
+    if game_save_queue is None:
+        return {"write_behind": False, "matches": match_queue.stats()}
+    return {"write_behind": True, **game_save_queue.stats(), "matches": match_queue.stats()}
+
+@app.get("/api/stats/rooms")
+async def get_room_stats():
+    return {
+        **room_reaper.stats(),
+        "score_ticker": score_ticker.stats(),
+        "matchmaking": matchmaker.stats(),
+        "spectators": len(spectating),
+        "match_clock": match_clock.stats(),
+        "rate_limit": event_limiter.stats(),
+        "cluster": room_cluster.stats()
+    }
+
+@app.get("/api/stats/caches")
+async def get_cache_stats():
+    caches = (token_cache, profile_cache, records_cache, leaderboard_responses, achievement_responses)
+    return {**{cache.name: cache.stats() for cache in caches}, "rank_index": rank_index.stats()}
+
+@app.get("/api/leaderboard", response_model=List[LeaderboardEntry])
+async def get_leaderboard(request: Request, period: str = "all", mode: Optional[str] = None):
+    if period not in leaderboards.WINDOWS:
+        raise HTTPException(status_code=400, detail="Geçersiz dönem")
+    if mode and mode not in leaderboards.MODES:
+        raise HTTPException(status_code=400, detail="Geçersiz mod")
+    if period == "all" and not mode:
+        # Served from the materialized user_stats collection (see user_stats.py)
+        entry = await leaderboard_responses.get('top', lambda: user_stats.top_n(db, 10))
+    else:
+        # Current day/week and per-mode boards come from the rollup buckets
+        board = leaderboards.board_key(period, datetime.now(timezone.utc), mode)
+        entry = await leaderboard_responses.get(board, lambda: leaderboards.top_n(db, board, 10))
+    return cached_json(request, entry, "public, no-cache")
+
+@app.get("/api/leaderboard/me", response_model=RankNeighbourhood)
+async def get_my_rank(k: int = Query(5, ge=0, le=50), user_id: str = Depends(get_current_user)):
+    # Rank and neighbours from the in-memory index (see rankings.py)
+    if not await rank_index.ensure(user_id):
+        raise HTTPException(status_code=404, detail="Kullanıcı bulunamadı")
+    return rank_index.around(user_id, k)
 
-@app.get("/api/achievements")
-async def get_achievements(user_id: str = Depends(get_current_user)):
-    achievements = await db.achievements.find(
+@app.get("/api/achievements", response_model=List[Achievement])
+async def get_achievements(request: Request, user_id: str = Depends(get_current_user)):
+    entry = await achievement_responses.get(user_id, lambda: db.achievements.find(
         {"user_id": user_id},
-        {"_id": 0}
-    ).to_list(100)
-    return achievements
-
-async def check_achievements(user_id: str, score: int):
-    achievements_to_check = [
-        {"name": "İlk Vuruş", "condition": score >= 1},
-        {"name": "10 Vuruş", "condition": score >= 10},
-        {"name": "50 Vuruş", "condition": score >= 50},
-        {"name": "100 Vuruş", "condition": score >= 100},
-        {"name": "Kombo Ustası", "condition": score >= 200},
-    ]
-    
-    for ach in achievements_to_check:
-        if ach["condition"]:
-            existing = await db.achievements.find_one(
-                {"user_id": user_id, "achievement_name": ach["name"]},
-                {"_id": 0}
-            )
-            if not existing:
-                ach_doc = {
-                    "id": str(uuid.uuid4()),
-                    "user_id": user_id,
-                    "achievement_name": ach["name"],
-                    "unlocked_at": datetime.now(timezone.utc).isoformat()
-                }
-                await db.achievements.insert_one(ach_doc)
+        ACHIEVEMENT_PROJECTION
+    ).to_list(100))
+    return cached_json(request, entry, "private, no-cache")
 
 # Socket.IO events
-game_rooms: Dict[str, Dict] = {}
+game_rooms = RoomRegistry()
+room_cluster = cluster.Cluster(client_manager, room_directory)
+
+def room_event(handler):
+    # Rooms live on the worker that created them; events from a sid that
+    # joined a room on another worker are forwarded there
+    room_cluster.register(handler.__name__, handler)
+
+    @functools.wraps(handler)
+    async def wrapper(sid, data=None):
+        owner = room_cluster.remote_owner(sid)
+        if owner is not None:
+            await room_cluster.forward(owner, handler.__name__, sid, data)
+            return
+        await handler(sid, data)
+    return wrapper
+
+async def close_socket_rooms(room):
+    await sio.close_room(room.code)
+    await sio.close_room(room.spectator_room)
+
+async def notify_room_closed(room):
+    score_ticker.discard(room.code)
+    match_clock.cancel(room.code)
+    await room_cluster.release(room.code)
+    await sio.emit('room_closed', {'reason': 'expired'}, room=[room.code, room.spectator_room])
+    await close_socket_rooms(room)
+
+room_reaper = RoomReaper(
+    game_rooms,
+    ttls={
+        WAITING: float(os.environ.get('ROOM_TTL_WAITING', '600')),
+        PLAYING: float(os.environ.get('ROOM_TTL_PLAYING', '300')),
+        FINISHED: float(os.environ.get('ROOM_TTL_FINISHED', '60')),
+    },
+    interval=float(os.environ.get('ROOM_SWEEP_INTERVAL', '30')),
+    on_evict=notify_room_closed
+)
+
+MAX_HITS_PER_BATCH = int(os.environ.get('MAX_HITS_PER_BATCH', '100'))
+
+SPECTATOR_UPDATE_INTERVAL = 1.0 / float(os.environ.get('SPECTATOR_UPDATE_HZ', '4'))
+
+def score_payload(score: int):
+    return score if COMPACT_SCORES else {'score': score}
+
+def scores_payload(room):
+    return [room.player1_score, room.player2_score] if COMPACT_SCORES else room.scores()
+
+async def broadcast_scores(room):
+    # Each player only hears about the opponent's score, and only if it moved
+    if room.player1_score != room.player1_reported:
+        room.player1_reported = room.player1_score
+        if room.player2:
+            await sio.emit('opponent_score', score_payload(room.player1_score), room=room.player2)
+    if room.player2_score != room.player2_reported:
+        room.player2_reported = room.player2_score
+        if room.player1:
+            await sio.emit('opponent_score', score_payload(room.player2_score), room=room.player1)
+    if room.spectators:
+        # One emit per update for all viewers, at most SPECTATOR_UPDATE_HZ;
+        # a throttled update is retried on a later tick
+        now = time.monotonic()
+        if now - room.spectators_reported_at >= SPECTATOR_UPDATE_INTERVAL:
+            room.spectators_reported_at = now
+            await sio.emit('score_update', scores_payload(room), room=room.spectator_room)
+        else:
+            score_ticker.defer(room)
+
+score_ticker = ScoreTicker(float(os.environ.get('SCORE_TICK_HZ', '20')), broadcast_scores)
+
+connected_clients = 0
+metrics.registry.gauge("game_rooms", "Rooms held by this worker", lambda: len(game_rooms))
+metrics.registry.gauge("socketio_connected_clients", "Connected Socket.IO clients", lambda: connected_clients)
+metrics.registry.gauge("log_records_dropped", "Log records dropped because the log queue was full",
+                       log_setup.dropped_records)
 
 @sio.event
 async def connect(sid, environ):
-    logger.info(f"Client connected: {sid}")
+    global connected_clients
+    connected_clients += 1
+    event_log['connect'].info("Client connected: %s", sid)
 
 @sio.event
-async def disconnect(sid):
-    logger.info(f"Client disconnected: {sid}")
-    # Remove player from any room
-    for room_code, room in list(game_rooms.items()):
-        if sid in [room.get('player1'), room.get('player2')]:
-            if room.get('player1') == sid:
-                if room.get('player2'):
-                    await sio.emit('opponent_left', room=room.get('player2'))
-            elif room.get('player2') == sid:
-                if room.get('player1'):
-                    await sio.emit('opponent_left', room=room.get('player1'))
-            del game_rooms[room_code]
-            break
+async def disconnect(sid, reason=None):
+    global connected_clients
+    connected_clients -= 1
+    event_log['disconnect'].info("Client disconnected: %s", sid)
+    event_limiter.forget(sid)
+    matchmaker.cancel(sid)
+    await stop_watching(sid)
+    if await leave_remote_room(sid):
+        return
+    await remove_player(sid)
+
+async def leave_remote_room(sid) -> bool:
+    # A sid whose room lives on another worker leaves it there; True if it had one
+    owner = room_cluster.unbind(sid)
+    if owner is None:
+        return False
+    await room_cluster.forward(owner, 'remove_player', sid, None)
+    return True
+
+async def remove_player(sid, data=None):
+    # Remove player from their room
+    room = game_rooms.room_for_sid(sid)
+    if room is None:
+        return
+    if room.opponent_of(sid):
+        await sio.emit('opponent_left', room=room.code, skip_sid=sid)
+    if room.spectators:
+        await sio.emit('room_closed', {'reason': 'player_left'}, room=room.spectator_room)
+    game_rooms.remove(room.code)
+    score_ticker.discard(room.code)
+    match_clock.cancel(room.code)
+    await room_cluster.release(room.code)
+    await close_socket_rooms(room)
+
+room_cluster.register('remove_player', remove_player)
+
+def socket_user_id(data) -> Optional[str]:
+    # Socket events carry the player's JWT as data['token'] when logged in
+    token = data.get('token') if isinstance(data, dict) else None
+    return user_id_from_token(token) if token else None
+
+async def claim_room_code() -> str:
+    room_code = game_rooms.new_code()
+    while not await room_cluster.claim(room_code):
+        room_code = game_rooms.new_code()
+    return room_code
 
 @sio.event
 async def create_room(sid, data):
-    room_code = str(uuid.uuid4())[:6].upper()
-    game_rooms[room_code] = {
-        'player1': sid,
-        'player2': None,
-        'player1_score': 0,
-        'player2_score': 0,
-        'player1_username': data.get('username', 'Oyuncu 1'),
-        'player2_username': None,
-        'game_started': False
-    }
-    await sio.emit('room_created', {'room_code': room_code}, room=sid)
-    logger.info(f"Room created: {room_code} by {sid}")
+    matchmaker.cancel(sid)
+    await leave_remote_room(sid)
+    room = game_rooms.create(
+        sid, data.get('username', 'Oyuncu 1'), await claim_room_code(), socket_user_id(data)
+    )
+    await sio.enter_room(sid, room.code)
+    await sio.emit('room_created', {'room_code': room.code}, room=sid)
+    event_log['create_room'].info("Room created: %s by %s", room.code, sid)
 
 @sio.event
 async def join_room(sid, data):
+    matchmaker.cancel(sid)
     room_code = data['room_code'].upper()
-    if room_code not in game_rooms:
+    room = game_rooms.get(room_code)
+    if room is None:
+        owner = await room_cluster.owner_of(room_code)
+        if owner is not None and owner != room_cluster.host_id:
+            # The owning worker runs the join and this sid's later room events
+            room_cluster.bind(sid, owner)
+            await room_cluster.forward(owner, 'join_room', sid, data)
+            return
         await sio.emit('error', {'message': 'Oda bulunamadı'}, room=sid)
         return
     
-    room = game_rooms[room_code]
-    if room['player2'] is not None:
+    if room.player2 is not None:
         await sio.emit('error', {'message': 'Oda dolu'}, room=sid)
         return
     
-    room['player2'] = sid
-    room['player2_username'] = data.get('username', 'Oyuncu 2')
+    await leave_remote_room(sid)
+    game_rooms.join(room, sid, data.get('username', 'Oyuncu 2'), socket_user_id(data))
+    await sio.enter_room(sid, room.code)
     
     # Notify both players
     await sio.emit('player_joined', {
-        'player1_username': room['player1_username'],
-        'player2_username': room['player2_username']
-    }, room=room['player1'])
+        'player1_username': room.player1_username,
+        'player2_username': room.player2_username
+    }, room=room.code)
     
-    await sio.emit('player_joined', {
-        'player1_username': room['player1_username'],
-        'player2_username': room['player2_username']
-    }, room=sid)
-    
-    logger.info(f"Player {sid} joined room {room_code}")
+    event_log['join_room'].info("Player %s joined room %s", sid, room_code)
+
+room_cluster.register('join_room', join_room)
+
+async def start_match(first, second):
+    # Matchmaker paired two waiting players: put them in a fresh room, with
+    # the longer-waiting player as host (the client that sends start_game)
+    room_code = await claim_room_code()
+    still_here = [t for t in (first, second) if sio.manager.is_connected(t.sid, '/')]
+    if len(still_here) < 2:
+        # Someone left while the room was being set up; the other keeps searching
+        await room_cluster.release(room_code)
+        for ticket in still_here:
+            await matchmaker.enqueue(ticket.sid, ticket.username, ticket.rating, ticket.user_id)
+        return
+    room = game_rooms.create(first.sid, first.username, room_code, first.user_id)
+    game_rooms.join(room, second.sid, second.username, second.user_id)
+    await sio.enter_room(first.sid, room.code)
+    await sio.enter_room(second.sid, room.code)
+    match = {
+        'room_code': room.code,
+        'player1_username': room.player1_username,
+        'player2_username': room.player2_username
+    }
+    await sio.emit('match_found', {**match, 'host': True}, room=first.sid)
+    await sio.emit('match_found', {**match, 'host': False}, room=second.sid)
+    event_log['find_match'].info("Matched %s and %s in room %s", first.sid, second.sid, room.code)
+
+matchmaker = Matchmaker(
+    start_match,
+    # 0 pairs anyone with anyone; otherwise players are banded by total_score
+    band_width=int(os.environ.get('MATCH_SKILL_BAND', '0')),
+    widen_after=float(os.environ.get('MATCH_WIDEN_AFTER', '5')),
+    matches_per_second=float(os.environ.get('MATCH_RATE', '0')),
+    interval=float(os.environ.get('MATCH_TICK_INTERVAL', '0.05'))
+)
+metrics.registry.gauge("matchmaking_waiting", "Players waiting for a match", lambda: len(matchmaker))
 
 @sio.event
+async def find_match(sid, data=None):
+    # {'username': ..., 'token': ...}; the token identifies the player for
+    # skill bands and match history
+    data = data or {}
+    if game_rooms.room_for_sid(sid) is not None:
+        await sio.emit('error', {'message': 'Zaten bir odadasınız'}, room=sid)
+        return
+    await leave_remote_room(sid)
+    rating = 0
+    user_id = socket_user_id(data)
+    if user_id is not None and matchmaker.band_width > 0:
+        profile = await load_profile(user_id)
+        rating = profile.get('total_score', 0) if profile else 0
+    await sio.emit('match_searching', {}, room=sid)
+    await matchmaker.enqueue(sid, data.get('username', 'Oyuncu'), rating, user_id)
+
+@sio.event
+async def cancel_match(sid, data=None):
+    if matchmaker.cancel(sid):
+        await sio.emit('match_cancelled', {}, room=sid)
+
+@sio.event
+@room_event
 async def start_game(sid, data):
-    room_code = data['room_code'].upper()
-    if room_code not in game_rooms:
+    room = game_rooms.room_for_sid(sid)
+    if room is None:
         return
     
-    room = game_rooms[room_code]
-    if room['player1'] != sid and room['player2'] != sid:
+    if not room.game_started:
+        room.start()
+        match_clock.schedule(room.code, MATCH_DURATION + MATCH_END_GRACE)
+        
+        # Start game for both players and any spectators
+        await sio.emit('game_start', {'duration': MATCH_DURATION}, room=[room.code, room.spectator_room])
+        event_log['start_game'].info("Game started in room %s", room.code)
+
+async def add_hits(sid, count):
+    room = game_rooms.room_for_sid(sid)
+    if room is None or room.finished:
         return
     
-    if not room['game_started']:
-        room['game_started'] = True
-        room['player1_score'] = 0
-        room['player2_score'] = 0
-        
-        # Start game for both players
-        await sio.emit('game_start', {}, room=room['player1'])
-        await sio.emit('game_start', {}, room=room['player2'])
-        logger.info(f"Game started in room {room_code}")
+    if sid == room.player1:
+        room.player1_score += count
+    else:
+        room.player2_score += count
+    # Opponent is told on the next score tick
+    await score_ticker.mark(room, count)
+
+hit_log = event_log['player_hit']
+hits_log = event_log['player_hits']
 
 @sio.event
+@room_event
 async def player_hit(sid, data):
-    room_code = data['room_code'].upper()
-    if room_code not in game_rooms:
+    hit_log.debug("Hit by %s", sid)
+    await add_hits(sid, 1)
+
+@sio.event
+@room_event
+async def player_hits(sid, data):
+    # Client-side coalesced hits: {'count': n}
+    try:
+        count = int(data.get('count', 0))
+    except (AttributeError, TypeError, ValueError):
         return
+    if count <= 0:
+        return
+    hits_log.debug("%d hits by %s", count, sid)
+    await add_hits(sid, min(count, MAX_HITS_PER_BATCH))
+
+async def record_match(room, duration: float):
+    if room.player1_score > room.player2_score:
+        winner = 'player1'
+    elif room.player2_score > room.player1_score:
+        winner = 'player2'
+    else:
+        winner = None
+    match = {
+        "_id": str(uuid.uuid4()),
+        "room_code": room.code,
+        "mode": ONLINE_MODE,
+        "duration": round(duration),
+        "date": datetime.now(timezone.utc).isoformat(),
+        "players": [
+            {"user_id": room.player1_user_id, "username": room.player1_username, "score": room.player1_score},
+            {"user_id": room.player2_user_id, "username": room.player2_username, "score": room.player2_score},
+        ],
+        "winner": winner
+    }
+    try:
+        await match_queue.put(match)
+    except WriteBehindFull:
+        logger.error("Match queue full, dropping result of room %s", room.code)
+
+async def finish_match(room):
+    # Both clients send game_end and the match clock may fire too; the first
+    # one during play records the match
+    recording = room.game_started and not room.finished
+    duration = time.monotonic() - room.state_since
+    room.finish()
+    match_clock.cancel(room.code)
+    await score_ticker.flush_room(room)
     
-    room = game_rooms[room_code]
-    if sid == room['player1']:
-        room['player1_score'] += 1
-        # Send score to opponent
-        if room['player2']:
-            await sio.emit('opponent_score', {'score': room['player1_score']}, room=room['player2'])
-    elif sid == room['player2']:
-        room['player2_score'] += 1
-        # Send score to opponent
-        if room['player1']:
-            await sio.emit('opponent_score', {'score': room['player2_score']}, room=room['player1'])
+    # Notify both players and any spectators of final scores
+    await sio.emit('game_ended', room.final_data(), room=[room.code, room.spectator_room])
+    if recording:
+        await record_match(room, duration)
+    # Don't delete room immediately, let players see results;
+    # room_reaper evicts it once ROOM_TTL_FINISHED has passed
+
+async def on_match_deadline(room_code: str):
+    room = game_rooms.get(room_code)
+    if room is None or not room.game_started or room.finished:
+        return
+    await finish_match(room)
+    event_log['game_end'].info("Match clock ended room %s", room.code)
+
+# Server-side end of every online match: one timer wheel task for all rooms
+MATCH_DURATION = int(os.environ.get('MATCH_DURATION', '10'))
+# Slack for the clients' own game_end and last hits to arrive first
+MATCH_END_GRACE = float(os.environ.get('MATCH_END_GRACE', '1.5'))
+match_clock = TimerWheel(
+    on_match_deadline, resolution=float(os.environ.get('MATCH_CLOCK_RESOLUTION', '0.1'))
+)
 
 @sio.event
+@room_event
 async def game_end(sid, data):
+    room = game_rooms.room_for_sid(sid)
+    if room is None:
+        return
+    
+    await finish_match(room)
+    event_log['game_end'].info("Game ended in room %s", room.code)
+
+# Spectators watching from this worker: sid -> (room code, owning worker, or
+# None when the room is local). Viewers sit in the room's spectator_room and
+# get score_update from broadcast_scores, so player_hit does no work per viewer
+spectating: Dict[str, tuple] = {}
+
+async def add_spectator(sid, data):
+    room = game_rooms.get(data['room_code'])
+    if room is None:
+        await sio.emit('error', {'message': 'Oda bulunamadı'}, room=sid)
+        return False
+    room.spectators += 1
+    await sio.emit('spectating', room.snapshot(), room=sid)
+    return True
+
+async def remove_spectator(sid, data):
+    room = game_rooms.get(data['room_code'])
+    if room is not None and room.spectators > 0:
+        room.spectators -= 1
+
+room_cluster.register('add_spectator', add_spectator)
+room_cluster.register('remove_spectator', remove_spectator)
+
+@sio.event
+async def watch_match(sid, data):
     room_code = data['room_code'].upper()
+    await stop_watching(sid)
+    owner = None
     if room_code not in game_rooms:
+        owner = await room_cluster.owner_of(room_code)
+        if owner is None or owner == room_cluster.host_id:
+            await sio.emit('error', {'message': 'Oda bulunamadı'}, room=sid)
+            return
+    await sio.enter_room(sid, spectator_room(room_code))
+    spectating[sid] = (room_code, owner)
+    if owner is not None:
+        await room_cluster.forward(owner, 'add_spectator', sid, {'room_code': room_code})
+    elif not await add_spectator(sid, {'room_code': room_code}):
+        await stop_watching(sid)
+    event_log['watch_match'].info("Spectator %s watching room %s", sid, room_code)
+
+@sio.event
+async def stop_watching(sid, data=None):
+    entry = spectating.pop(sid, None)
+    if entry is None:
         return
-    
-    room = game_rooms[room_code]
-    
-    # Notify both players of final scores
-    final_data = {
-        'player1_score': room['player1_score'],
-        'player2_score': room['player2_score'],
-        'player1_username': room['player1_username'],
-        'player2_username': room['player2_username']
-    }
-    
-    if room['player1']:
-        await sio.emit('game_ended', final_data, room=room['player1'])
-    if room['player2']:
-        await sio.emit('game_ended', final_data, room=room['player2'])
-    
-    logger.info(f"Game ended in room {room_code}")
-    # Don't delete room immediately, let players see results
+    room_code, owner = entry
+    await sio.leave_room(sid, spectator_room(room_code))
+    if owner is not None:
+        await room_cluster.forward(owner, 'remove_spectator', sid, {'room_code': room_code})
+    else:
+        await remove_spectator(sid, {'room_code': room_code})
+
+metrics.instrument_socketio(sio)
+# Installed last so excess events are dropped before any other work,
+# including the latency histogram (see ratelimit.py)
+event_limiter = ratelimit.EventRateLimiter.from_env()
+event_limiter.install(sio)
+
+@app.on_event("startup")
+async def startup_indexes():
+    if os.environ.get('RUN_MIGRATIONS_ON_STARTUP', '1').lower() in ('1', 'true', 'yes'):
+        await migrations.run(db)
+    if isinstance(room_directory, cluster.MongoRoomDirectory):
+        await room_directory.ensure_indexes()
+
+@app.on_event("startup")
+async def load_rank_index():
+    await rank_index.load()
+    rank_index.start()
+
+@app.on_event("startup")
+async def start_background_tasks():
+    room_reaper.start()
+    score_ticker.start()
+    match_clock.start()
+    matchmaker.start()
+    match_queue.start()
+    if game_save_queue is not None:
+        game_save_queue.start()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await room_reaper.stop()
+    await score_ticker.stop()
+    await match_clock.stop()
+    await matchmaker.stop()
+    await rank_index.stop()
+    # Write out queued matches and saves before the Mongo client goes away
+    await match_queue.close()
+    if game_save_queue is not None:
+        await game_save_queue.close()
     client.close()
+    password_service.shutdown()
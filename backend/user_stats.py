@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import os
+import sys
+from pathlib import Path
+
+from pymongo import ReplaceOne, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Materialized per-user leaderboard stats. One document per user:
+#   {user_id, username, total_score, best_score, games_played}
+# kept up to date by save_game so the leaderboard is a top-N index read.
+STATS_PROJECTION = {
+    "_id": 0,
+    "username": 1,
+    "total_score": 1,
+    "best_score": 1,
+    "games_played": 1,
+}
+
+
+async def init_user_stats(db, user_id: str, username: str):
+    await db.user_stats.update_one(
+        {"user_id": user_id},
+        {"$setOnInsert": {
+            "user_id": user_id,
+            "username": username,
+            "total_score": 0,
+            "best_score": 0,
+            "games_played": 0,
+        }},
+        upsert=True,
+    )
+
+
+async def record_game(db, user_id: str, score: int):
+    result = await db.user_stats.update_one(
+        {"user_id": user_id},
+        {
+            "$inc": {"total_score": score, "games_played": 1},
+            "$max": {"best_score": score},
+        },
+        upsert=True,
+    )
+    if result.upserted_id is not None:
+        # User predates user_stats and was not backfilled yet
+        user = await db.users.find_one({"id": user_id}, {"_id": 0, "username": 1})
+        if user:
+            await db.user_stats.update_one(
+                {"user_id": user_id},
+                {"$set": {"username": user["username"]}}
+            )
+
+
+async def record_games(db, per_user: dict):
+    """Bulk version of record_game.
+
+    ``per_user`` maps user_id -> {"total_score", "best_score", "games_played"}
+    for the games being recorded.
+    """
+    if not per_user:
+        return
+    ops = [
+        UpdateOne(
+            {"user_id": user_id},
+            {
+                "$inc": {"total_score": totals["total_score"], "games_played": totals["games_played"]},
+                "$max": {"best_score": totals["best_score"]},
+            },
+            upsert=True,
+        )
+        for user_id, totals in per_user.items()
+    ]
+    result = await db.user_stats.bulk_write(ops, ordered=False)
+    if result.upserted_ids:
+        # Users that predate user_stats and were not backfilled yet
+        user_ids = list(per_user)
+        missing = [user_ids[index] for index in result.upserted_ids]
+        async for user in db.users.find({"id": {"$in": missing}}, {"_id": 0, "id": 1, "username": 1}):
+            await db.user_stats.update_one(
+                {"user_id": user["id"]},
+                {"$set": {"username": user["username"]}}
+            )
+
+
+def summarize_games(games) -> dict:
+    """Per-user totals for record_games from a list of game documents."""
+    per_user = {}
+    for game in games:
+        totals = per_user.setdefault(
+            game["user_id"], {"total_score": 0, "best_score": 0, "games_played": 0}
+        )
+        totals["total_score"] += game["score"]
+        totals["games_played"] += 1
+        if game["score"] > totals["best_score"]:
+            totals["best_score"] = game["score"]
+    return per_user
+
+
+async def top_n(db, limit: int = 10):
+    return await db.user_stats.find(
+        {}, STATS_PROJECTION
+    ).sort("total_score", -1).limit(limit).to_list(limit)
+
+
+async def rebuild(db, batch_size: int = 1000) -> int:
+    """Recompute every user_stats document from users and games."""
+
+    per_user = {}
+    pipeline = [
+        {"$group": {
+            "_id": "$user_id",
+            "best_score": {"$max": "$score"},
+            "games_played": {"$sum": 1},
+        }}
+    ]
+    async for row in db.games.aggregate(pipeline, allowDiskUse=True):
+        per_user[row["_id"]] = row
+
+    written = 0
+    ops = []
+    cursor = db.users.find({}, {"_id": 0, "id": 1, "username": 1, "total_score": 1})
+    async for user in cursor:
+        games = per_user.get(user["id"], {})
+        ops.append(ReplaceOne(
+            {"user_id": user["id"]},
+            {
+                "user_id": user["id"],
+                "username": user["username"],
+                "total_score": user.get("total_score", 0),
+                "best_score": games.get("best_score") or 0,
+                "games_played": games.get("games_played", 0),
+            },
+            upsert=True,
+        ))
+        if len(ops) >= batch_size:
+            await db.user_stats.bulk_write(ops, ordered=False)
+            written += len(ops)
+            ops = []
+    if ops:
+        await db.user_stats.bulk_write(ops, ordered=False)
+        written += len(ops)
+
+    logger.info(f"Rebuilt user_stats for {written} users")
+    return written
+
+
+async def _main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        written = await rebuild(client[os.environ['DB_NAME']])
+        print(f"user_stats rebuilt for {written} users")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    # Usage: python user_stats.py rebuild
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python user_stats.py rebuild")
+        sys.exit(1)
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindFull(Exception):
+    pass
+
+
+class WriteBehindQueue:
+    """Buffers documents in memory and hands them to ``flush`` in batches.
+
+    A batch is flushed once ``batch_size`` items are waiting or
+    ``flush_interval`` seconds after the previous flush, whichever comes
+    first. At most ``max_pending`` items are buffered; ``put`` waits up to
+    ``put_timeout`` seconds for room and then raises WriteBehindFull so
+    callers can shed load. A failed batch is retried ``max_retries`` times
+    before it is dropped.
+    """
+
+    def __init__(self, name: str, flush: Callable[[List[dict]], Awaitable[None]],
+                 batch_size: int = 500, flush_interval: float = 0.5,
+                 max_pending: int = 10000, put_timeout: float = 1.0, max_retries: int = 3):
+        self.name = name
+        self.flush = flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        self.flushed = 0
+        self.batches = 0
+        self.failures = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.last_flush_ms = 0.0
+        self._items: List[dict] = []
+        self._wake = asyncio.Event()
+        self._space = asyncio.Event()
+        self._closing = False
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    async def put(self, item: dict):
+        deadline = time.monotonic() + self.put_timeout
+        while len(self._items) >= self.max_pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.rejected += 1
+                raise WriteBehindFull()
+            self._space.clear()
+            self._wake.set()
+            try:
+                await asyncio.wait_for(self._space.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+        self._items.append(item)
+        if len(self._items) >= self.batch_size:
+            self._wake.set()
+
+    async def _flush_batch(self):
+        batch = self._items[:self.batch_size]
+        del self._items[:self.batch_size]
+        self._space.set()
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                await self.flush(batch)
+            except Exception:
+                self.failures += 1
+                logger.exception(f"{self.name}: flush of {len(batch)} items failed (attempt {attempt + 1})")
+                await asyncio.sleep(min(0.1 * 2 ** attempt, 2.0))
+                continue
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+            self.flushed += len(batch)
+            self.batches += 1
+            return
+        self.dropped += len(batch)
+        logger.error(f"{self.name}: dropped {len(batch)} items after {self.max_retries + 1} attempts")
+
+    async def run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            while self._items:
+                await self._flush_batch()
+                if len(self._items) < self.batch_size:
+                    break
+
+    def start(self):
+        self._closing = False
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def close(self):
+        """Stop the background flusher and write out everything still buffered."""
+        self._closing = True
+        self._wake.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        while self._items:
+            await self._flush_batch()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._items),
+            "max_pending": self.max_pending,
+            "batch_size": self.batch_size,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "failures": self.failures,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+        }
@@ -3,6 +3,7 @@ import axios from "axios";
 import { toast } from "sonner";
 import { useNavigate } from "react-router-dom";
 import io from "socket.io-client";
+import msgpackParser from "socket.io-msgpack-parser";
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -10,6 +11,30 @@ const API = `${BACKEND_URL}/api`;
 const COMBO_WINDOW = 200;
 const COMBO_THRESHOLD = 5;
 const AUTO_CLICK_SPEED = 20;
+const HIT_FLUSH_INTERVAL = 50;
+// Online matches last as long as the server's game_start says (MATCH_DURATION)
+const ONLINE_DURATION = 10;
+// Games that could not be saved while offline, replayed through /game/sync
+const PENDING_GAMES_KEY = 'pendingGames';
+const SYNC_BATCH_SIZE = 100;
+// Must match the backend's SOCKETIO_SERIALIZER
+const SOCKET_OPTIONS = process.env.REACT_APP_SOCKETIO_PARSER === 'msgpack' ? { parser: msgpackParser } : {};
+
+// Score updates arrive as {score} / {player1_score, player2_score}, or as a
+// bare number / [player1, player2] when the backend sends compact scores
+const readScore = (data) => (typeof data === 'number' ? data : data.score);
+const readScores = (data) => (
+  Array.isArray(data) ? { player1_score: data[0], player2_score: data[1] } : data
+);
+
+const readPendingGames = () => {
+  try {
+    return JSON.parse(localStorage.getItem(PENDING_GAMES_KEY)) || [];
+  } catch (error) {
+    return [];
+  }
+};
+const writePendingGames = (games) => localStorage.setItem(PENDING_GAMES_KEY, JSON.stringify(games));
 
 export default function Game({ user, logout }) {
   const [screen, setScreen] = useState('start');
@@ -26,13 +51,22 @@ export default function Game({ user, logout }) {
   const [inputRoomCode, setInputRoomCode] = useState('');
   const [opponentUsername, setOpponentUsername] = useState('');
   const [autoClickerActive, setAutoClickerActive] = useState(false);
+  const [spectated, setSpectated] = useState(null);
   
   const lastClickTime = useRef(0);
   const gameInterval = useRef(null);
   const autoClickerInterval = useRef(null);
   const socketRef = useRef(null);
+  const pendingHits = useRef(0);
+  // Current screen for socket handlers, which would otherwise see the one
+  // from when they were registered
+  const screenRef = useRef(screen);
   const navigate = useNavigate();
 
+  useEffect(() => {
+    screenRef.current = screen;
+  }, [screen]);
+
   useEffect(() => {
     loadRecords();
     
@@ -66,6 +100,47 @@ export default function Game({ user, logout }) {
     };
   }, [autoClickerActive, isGameActive]);
 
+  useEffect(() => {
+    if (mode !== 'Online Mod' || !isGameActive) return;
+    // Online hits are sent in batches instead of one packet per click
+    const hitFlushInterval = setInterval(flushHits, HIT_FLUSH_INTERVAL);
+    return () => {
+      clearInterval(hitFlushInterval);
+      flushHits();
+    };
+  }, [mode, isGameActive]);
+
+  const flushHits = () => {
+    if (pendingHits.current > 0 && socketRef.current) {
+      socketRef.current.emit('player_hits', { room_code: roomCode, count: pendingHits.current });
+    }
+    pendingHits.current = 0;
+  };
+
+  useEffect(() => {
+    syncPendingGames();
+    window.addEventListener('online', syncPendingGames);
+    return () => window.removeEventListener('online', syncPendingGames);
+  }, []);
+
+  const syncPendingGames = async () => {
+    const pending = readPendingGames();
+    if (pending.length === 0) return;
+    try {
+      const token = localStorage.getItem('token');
+      const response = await axios.post(
+        `${API}/game/sync`,
+        { games: pending.slice(0, SYNC_BATCH_SIZE) },
+        { headers: { Authorization: `Bearer ${token}` } }
+      );
+      const done = new Set([...response.data.saved, ...response.data.duplicates]);
+      writePendingGames(readPendingGames().filter((game) => !done.has(game.client_id)));
+      await loadRecords();
+    } catch (error) {
+      console.error('Bekleyen oyunlar gönderilemedi:', error);
+    }
+  };
+
   const loadRecords = async () => {
     try {
       const token = localStorage.getItem('token');
@@ -84,11 +159,11 @@ export default function Game({ user, logout }) {
     startGame('single');
   };
 
-  const startGame = (gameMode) => {
+  const startGame = (gameMode, seconds = duration) => {
     setScore(0);
     setOpponentScore(0);
     setCombo(0);
-    setTimeLeft(duration);
+    setTimeLeft(seconds);
     setIsGameActive(true);
     setScreen('game');
     
@@ -121,7 +196,7 @@ export default function Game({ user, logout }) {
     lastClickTime.current = now;
     
     if (mode === 'Online Mod' && socketRef.current) {
-      socketRef.current.emit('player_hit', { room_code: roomCode });
+      pendingHits.current += 1;
     }
   };
 
@@ -151,9 +226,20 @@ export default function Game({ user, logout }) {
         await loadRecords();
       } catch (error) {
         console.error('Oyun kaydedilemedi:', error);
+        if (!error.response) {
+          // No answer from the server: keep the game and sync it later
+          writePendingGames([...readPendingGames(), {
+            client_id: crypto.randomUUID(),
+            mode: mode,
+            score: score,
+            duration: duration,
+            played_at: new Date().toISOString()
+          }]);
+        }
       }
     } else {
       if (socketRef.current) {
+        flushHits();
         socketRef.current.emit('game_end', { room_code: roomCode });
       }
     }
@@ -161,12 +247,38 @@ export default function Game({ user, logout }) {
     setScreen('end');
   };
 
+  const showFinalScores = (data, isPlayer1) => {
+    // The server ends online matches (its clock or either player's game_end)
+    // and its scores are the final ones
+    if (gameInterval.current) {
+      clearInterval(gameInterval.current);
+    }
+    pendingHits.current = 0;
+    setIsGameActive(false);
+    setCombo(0);
+    setAutoClickerActive(false);
+    setScore(isPlayer1 ? data.player1_score : data.player2_score);
+    setOpponentScore(isPlayer1 ? data.player2_score : data.player1_score);
+    setScreen('end');
+  };
+
+  const leaveClosedRoom = (socket) => {
+    // The server closed the room: an unanswered one expired while waiting,
+    // a finished one once its results were shown
+    socket.disconnect();
+    if (screenRef.current === 'wait') {
+      toast.error('Oda zaman aşımına uğradı');
+      setScreen('online');
+      setRoomCode('');
+    }
+  };
+
   const createRoom = () => {
-    const socket = io(BACKEND_URL);
+    const socket = io(BACKEND_URL, SOCKET_OPTIONS);
     socketRef.current = socket;
     
     socket.on('connect', () => {
-      socket.emit('create_room', { username: user.username });
+      socket.emit('create_room', { username: user.username, token: localStorage.getItem('token') });
     });
     
     socket.on('room_created', (data) => {
@@ -189,13 +301,22 @@ export default function Game({ user, logout }) {
       }, 2000);
     });
     
-    socket.on('game_start', () => {
-      setDuration(10);
-      startGame('online');
+    socket.on('game_start', (data) => {
+      const seconds = (data && data.duration) || ONLINE_DURATION;
+      setDuration(seconds);
+      startGame('online', seconds);
     });
     
     socket.on('opponent_score', (data) => {
-      setOpponentScore(data.score);
+      setOpponentScore(readScore(data));
+    });
+    
+    socket.on('game_ended', (data) => {
+      showFinalScores(data, true);
+    });
+    
+    socket.on('room_closed', () => {
+      leaveClosedRoom(socket);
     });
     
     socket.on('opponent_left', () => {
@@ -210,13 +331,14 @@ export default function Game({ user, logout }) {
       return;
     }
     
-    const socket = io(BACKEND_URL);
+    const socket = io(BACKEND_URL, SOCKET_OPTIONS);
     socketRef.current = socket;
     
     socket.on('connect', () => {
       socket.emit('join_room', { 
         room_code: inputRoomCode.toUpperCase(), 
-        username: user.username 
+        username: user.username,
+        token: localStorage.getItem('token')
       });
     });
     
@@ -227,25 +349,131 @@ export default function Game({ user, logout }) {
       toast.success('Odaya katıldınız!');
     });
     
-    socket.on('game_start', () => {
-      setDuration(10);
-      startGame('online');
+    socket.on('game_start', (data) => {
+      const seconds = (data && data.duration) || ONLINE_DURATION;
+      setDuration(seconds);
+      startGame('online', seconds);
     });
     
     socket.on('opponent_score', (data) => {
-      setOpponentScore(data.score);
+      setOpponentScore(readScore(data));
     });
     
     socket.on('error', (data) => {
       toast.error(data.message);
     });
     
+    socket.on('game_ended', (data) => {
+      showFinalScores(data, false);
+    });
+    
+    socket.on('room_closed', () => {
+      leaveClosedRoom(socket);
+    });
+    
     socket.on('opponent_left', () => {
       toast.error('Rakip oyundan ayrıldı');
       endGame();
     });
   };
 
+  const findMatch = () => {
+    const socket = io(BACKEND_URL, SOCKET_OPTIONS);
+    socketRef.current = socket;
+    let host = false;
+    
+    socket.on('connect', () => {
+      socket.emit('find_match', {
+        username: user.username,
+        token: localStorage.getItem('token')
+      });
+    });
+    
+    socket.on('match_searching', () => {
+      setScreen('search');
+    });
+    
+    socket.on('match_found', (data) => {
+      host = data.host;
+      setRoomCode(data.room_code);
+      setOpponentUsername(data.host ? data.player2_username : data.player1_username);
+      setScreen('wait');
+      toast.success('Rakip bulundu! Oyun başlıyor...');
+      if (data.host) {
+        setTimeout(() => {
+          socket.emit('start_game', { room_code: data.room_code });
+        }, 2000);
+      }
+    });
+    
+    socket.on('game_start', (data) => {
+      const seconds = (data && data.duration) || ONLINE_DURATION;
+      setDuration(seconds);
+      startGame('online', seconds);
+    });
+    
+    socket.on('opponent_score', (data) => {
+      setOpponentScore(readScore(data));
+    });
+    
+    socket.on('error', (data) => {
+      toast.error(data.message);
+    });
+    
+    socket.on('game_ended', (data) => {
+      showFinalScores(data, host);
+    });
+    
+    socket.on('room_closed', () => {
+      leaveClosedRoom(socket);
+    });
+    
+    socket.on('opponent_left', () => {
+      toast.error('Rakip oyundan ayrıldı');
+      endGame();
+    });
+  };
+
+  const watchMatch = () => {
+    if (!inputRoomCode || inputRoomCode.length < 4) {
+      toast.error('Geçerli bir oda kodu girin');
+      return;
+    }
+    
+    const socket = io(BACKEND_URL, SOCKET_OPTIONS);
+    socketRef.current = socket;
+    
+    socket.on('connect', () => {
+      socket.emit('watch_match', { room_code: inputRoomCode.toUpperCase() });
+    });
+    
+    socket.on('spectating', (data) => {
+      setSpectated(data);
+      setScreen('spectate');
+    });
+    
+    socket.on('game_start', () => {
+      setSpectated(prev => prev && { ...prev, state: 'playing', player1_score: 0, player2_score: 0 });
+    });
+    
+    socket.on('score_update', (data) => {
+      setSpectated(prev => prev && { ...prev, ...readScores(data) });
+    });
+    
+    socket.on('game_ended', (data) => {
+      setSpectated(prev => prev && { ...prev, ...data, state: 'finished' });
+    });
+    
+    socket.on('room_closed', () => {
+      toast.info('Maç sona erdi');
+      socket.disconnect();
+    });
+    
+    socket.on('error', (data) => {
+      toast.error(data.message);
+    });
+  };
+
   const cancelWait = () => {
     if (socketRef.current) {
       socketRef.current.disconnect();
@@ -325,9 +553,15 @@ export default function Game({ user, logout }) {
               className="room-input"
               data-testid="room-code-input"
             />
+            <button className="btn btn-online" onClick={findMatch} data-testid="find-match-button">
+              Rakip Bul
+            </button>
             <button className="btn btn-online" onClick={joinRoom} data-testid="join-room-button">
               Odaya Katıl
             </button>
+            <button className="btn btn-online" onClick={watchMatch} data-testid="watch-match-button">
+              Maçı İzle
+            </button>
             <button className="btn btn-online" onClick={createRoom} data-testid="create-room-button">
               Oda Oluştur
             </button>
@@ -338,6 +572,31 @@ export default function Game({ user, logout }) {
         </div>
       )}
 
+      {screen === 'search' && (
+        <div className="screen" data-testid="search-screen">
+          <h1>Rakip Aranıyor...</h1>
+          <p className="wait-message">Sana uygun bir rakip bulunduğunda oyun başlayacak</p>
+          <button className="btn btn-cancel" onClick={cancelWait} data-testid="cancel-search-button">
+            İptal Et / Geri Dön
+          </button>
+        </div>
+      )}
+
+      {screen === 'spectate' && spectated && (
+        <div className="screen" data-testid="spectate-screen">
+          <h1>İzleyici Modu</h1>
+          <p>
+            {spectated.state === 'waiting' ? 'Maçın başlaması bekleniyor...'
+              : spectated.state === 'playing' ? 'Maç devam ediyor' : 'Maç bitti'}
+          </p>
+          <p>{spectated.player1_username}: <span className="final-score" data-testid="spectate-player1-score">{spectated.player1_score}</span></p>
+          <p>{spectated.player2_username || '...'}: <span className="final-score" data-testid="spectate-player2-score">{spectated.player2_score}</span></p>
+          <button className="btn btn-cancel" onClick={cancelWait} data-testid="stop-watching-button">
+            İzlemeyi Bırak / Geri Dön
+          </button>
+        </div>
+      )}
+
       {screen === 'wait' && (
         <div className="screen" data-testid="wait-screen">
           <h1>Oyuncu Bekleniyor...</h1>
@@ -4,19 +4,26 @@ import { useNavigate } from "react-router-dom";
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
+const PERIODS = [
+  { value: 'all', label: 'Tüm Zamanlar' },
+  { value: 'week', label: 'Bu Hafta' },
+  { value: 'day', label: 'Bugün' }
+];
 
 export default function Leaderboard({ user }) {
   const [leaderboard, setLeaderboard] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [period, setPeriod] = useState('all');
   const navigate = useNavigate();
 
   useEffect(() => {
     loadLeaderboard();
-  }, []);
+  }, [period]);
 
   const loadLeaderboard = async () => {
+    setLoading(true);
     try {
-      const response = await axios.get(`${API}/leaderboard`);
+      const response = await axios.get(`${API}/leaderboard`, { params: { period } });
       setLeaderboard(response.data);
     } catch (error) {
       console.error('Liderlik tablosu yüklenemedi:', error);
@@ -29,6 +36,19 @@ export default function Leaderboard({ user }) {
     <div className="leaderboard-container">
       <div className="leaderboard-content">
         <h1 className="leaderboard-title">🏆 Liderlik Tablosu</h1>
+
+        <div className="leaderboard-periods">
+          {PERIODS.map(({ value, label }) => (
+            <button
+              key={value}
+              className={`btn ${period === value ? 'btn-main' : 'btn-secondary'}`}
+              onClick={() => setPeriod(value)}
+              data-testid={`leaderboard-period-${value}`}
+            >
+              {label}
+            </button>
+          ))}
+        </div>
         
         {loading ? (
           <p className="loading-text">Yükleniyor...</p>
@@ -0,0 +1,51 @@
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+@pytest.fixture(scope="session")
+def server():
+    pytest.importorskip("httpx")
+    # server reads these at import; set them only for the import so the Mongo
+    # tests in test_indexes still skip without a real MONGO_URL
+    import_env = {key: value for key, value in (("MONGO_URL", "mongodb://localhost:27017"), ("DB_NAME", "test"))
+                  if key not in os.environ}
+    os.environ.update(import_env)
+    try:
+        import server
+    finally:
+        for key in import_env:
+            del os.environ[key]
+    return server
+
+
+@pytest.fixture(scope="session")
+def app_client(server):
+    # One app lifespan for the session: the background queues are bound to
+    # the loop that started them
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from fastapi.testclient import TestClient
+
+    mongo = mongomock_motor.AsyncMongoMockClient()
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(server, "client", mongo)
+        patch.setattr(server, "db", mongo["test"])
+        with TestClient(server.app) as test_client:
+            yield test_client
+
+
+@pytest.fixture
+def client(server, app_client, monkeypatch):
+    # Fresh database per test, and no cached state from earlier tests
+    monkeypatch.setattr(server, "db", server.client[f"test_{uuid.uuid4().hex[:8]}"])
+    for cache in (server.token_cache, server.profile_cache, server.records_cache):
+        cache.clear()
+    for responses in (server.leaderboard_responses, server.achievement_responses):
+        responses.cache.clear()
+    return app_client
+
@@ -0,0 +1,207 @@
+import asyncio
+import importlib.util
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import cluster  # noqa: E402
+from matchmaking import Ticket  # noqa: E402
+
+WORKERS = 2
+
+
+def load_worker(index):
+    # A separate copy of server.py per worker, the way each process imports it
+    spec = importlib.util.spec_from_file_location(f"server_worker_{index}", BACKEND_DIR / "server.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def servers():
+    # server reads these at import; set them only for the imports
+    import_env = {key: value for key, value in (
+        ("MONGO_URL", "mongodb://localhost:27017"), ("DB_NAME", "test"), ("SOCKETIO_MESSAGE_QUEUE", "local")
+    ) if key not in os.environ}
+    os.environ.update(import_env)
+    try:
+        workers = []
+        for index in range(WORKERS):
+            # Endpoints and directory are replaced per test; see Cluster
+            cluster.use_local_backend(cluster.LocalEndpoint(None, index), None)
+            workers.append(load_worker(index))
+    finally:
+        for key in import_env:
+            del os.environ[key]
+    return workers
+
+
+class Cluster:
+    """Two workers sharing an InProcessBroker and a LocalRoomDirectory.
+
+    Sockets are named when connected; every packet a worker sends to one is
+    recorded under that name.
+    """
+
+    def __init__(self, servers):
+        self.servers = servers
+        self.broker = cluster.InProcessBroker(len(servers))
+        self.directory = cluster.LocalRoomDirectory()
+        self.sent = {}
+        self.sids = {}
+        for index, server in enumerate(servers):
+            server.sio.manager.endpoint = self.broker.endpoint(index)
+            server.room_cluster.directory = self.directory
+            server.room_cluster._remote_owner.clear()
+            server.sio.eio.send_packet = self.deliver
+            server.sio.manager_initialized = True
+            server.sio.manager.initialize()
+
+    async def deliver(self, eio_sid, packet):
+        self.sent.setdefault(eio_sid, []).append(json.loads(packet.data[1:]))
+
+    def events(self, name):
+        return [event for event, *_ in self.sent.get(name, [])]
+
+    def last(self, name, event):
+        return [data for sent, *data in self.sent.get(name, []) if sent == event][-1][0]
+
+    async def connect(self, worker, name):
+        self.sids[name] = await self.servers[worker].sio.manager.connect(name, "/")
+
+    async def emit(self, worker, event, name, data=None):
+        # Through sio.handlers, like an event from the socket
+        await self.servers[worker].sio.handlers["/"][event](self.sids[name], data)
+        await self.settle()
+
+    @staticmethod
+    async def settle():
+        # Let forwarded room calls and pub/sub emits reach the other worker
+        for _ in range(20):
+            await asyncio.sleep(0)
+
+
+def run(servers, scenario):
+    async def main():
+        c = Cluster(servers)
+        try:
+            await scenario(c)
+        finally:
+            for server in servers:
+                server.sio.manager.thread.cancel()
+    asyncio.run(main())
+
+
+async def remote_match(c, host, guest):
+    # host plays on worker 0, which owns the room; guest joins from worker 1
+    await c.connect(0, host)
+    await c.connect(1, guest)
+    await c.emit(0, "create_room", host, {"username": "A"})
+    code = c.servers[0].game_rooms.room_for_sid(c.sids[host]).code
+    await c.emit(1, "join_room", guest, {"room_code": code, "username": "B"})
+    return code
+
+
+def test_join_hits_and_end_are_forwarded_to_the_owner(servers):
+    async def scenario(c):
+        code = await remote_match(c, "a1", "b1")
+        owner, other = c.servers
+        assert await c.directory.lookup(code) == owner.room_cluster.host_id
+        assert other.game_rooms.get(code) is None
+        assert other.room_cluster.remote_owner(c.sids["b1"]) == owner.room_cluster.host_id
+
+        await c.emit(0, "start_game", "a1", {"room_code": code})
+        await c.emit(1, "player_hits", "b1", {"room_code": code, "count": 5})
+        await c.emit(0, "player_hits", "a1", {"room_code": code, "count": 3})
+        room = owner.game_rooms.get(code)
+        assert (room.player1_score, room.player2_score) == (3, 5)
+
+        await c.emit(1, "game_end", "b1", {"room_code": code})
+        assert room.finished
+        for name in ("a1", "b1"):
+            events = c.events(name)
+            assert events.index("player_joined") < events.index("game_start") < events.index("game_ended")
+            final = c.last(name, "game_ended")
+            assert (final["player1_score"], final["player2_score"]) == (3, 5)
+    run(servers, scenario)
+
+
+def test_disconnect_removes_the_player_on_the_owner(servers):
+    async def scenario(c):
+        code = await remote_match(c, "a2", "b2")
+        owner, other = c.servers
+
+        await c.emit(1, "disconnect", "b2", "client disconnect")
+        assert other.room_cluster.remote_owner(c.sids["b2"]) is None
+        assert owner.game_rooms.get(code) is None
+        assert "opponent_left" in c.events("a2")
+        assert await c.directory.lookup(code) is None
+    run(servers, scenario)
+
+
+@pytest.mark.parametrize("event, data", [
+    ("create_room", {"username": "B"}),
+    ("find_match", {"username": "B"}),
+])
+def test_leaving_a_remote_room_removes_the_player_there(servers, event, data):
+    async def scenario(c):
+        code = await remote_match(c, f"a-{event}", f"b-{event}")
+        owner, other = c.servers
+
+        await c.emit(1, event, f"b-{event}", data)
+        assert other.room_cluster.remote_owner(c.sids[f"b-{event}"]) is None
+        assert owner.game_rooms.get(code) is None
+        assert "opponent_left" in c.events(f"a-{event}")
+        other.matchmaker.cancel(c.sids[f"b-{event}"])
+    run(servers, scenario)
+
+
+def test_joining_a_local_room_leaves_the_remote_one(servers):
+    async def scenario(c):
+        code = await remote_match(c, "a3", "b3")
+        owner, other = c.servers
+        await c.connect(1, "c3")
+        await c.emit(1, "create_room", "c3", {"username": "C"})
+        local_code = other.game_rooms.room_for_sid(c.sids["c3"]).code
+
+        await c.emit(1, "join_room", "b3", {"room_code": local_code, "username": "B"})
+        assert owner.game_rooms.get(code) is None
+        assert "opponent_left" in c.events("a3")
+        assert other.game_rooms.room_for_sid(c.sids["b3"]).code == local_code
+    run(servers, scenario)
+
+
+def test_disconnect_cancels_a_queued_ticket(servers):
+    async def scenario(c):
+        await c.connect(0, "q1")
+        await c.emit(0, "find_match", "q1", {"username": "Q"})
+        matchmaker = c.servers[0].matchmaker
+        assert c.sids["q1"] in matchmaker
+
+        await c.emit(0, "disconnect", "q1", "client disconnect")
+        assert c.sids["q1"] not in matchmaker
+    run(servers, scenario)
+
+
+def test_start_match_requeues_the_player_still_connected(servers):
+    async def scenario(c):
+        server = c.servers[0]
+        await c.connect(0, "r1")
+        here = Ticket(c.sids["r1"], "R", 10, user_id="u1")
+        gone = Ticket("left-already", "G")
+
+        await server.start_match(here, gone)
+        assert server.game_rooms.room_for_sid(here.sid) is None
+        assert "match_found" not in c.events("r1")
+        assert here.sid in server.matchmaker and gone.sid not in server.matchmaker
+        # The claimed room code went back to the directory
+        assert c.directory._owners == {}
+        server.matchmaker.cancel(here.sid)
+    run(servers, scenario)
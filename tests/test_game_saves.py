@@ -0,0 +1,138 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+
+def register(client, name):
+    response = client.post("/api/auth/register", json={
+        "username": name, "email": f"{name}@example.com", "password": "sifre123"
+    })
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['token']}"}
+
+
+def test_profile_total_matches_saved_games(server, client):
+    headers = register(client, "ali")
+    for score in (5, 60, 250):
+        response = client.post("/api/game/save", json={"mode": "Tek Kişilik - Orta", "score": score, "duration": 10},
+                               headers=headers)
+        assert response.status_code == 200
+
+    assert client.get("/api/user/me", headers=headers).json()["total_score"] == 315
+    assert client.get("/api/leaderboard").json()[0]["total_score"] == 315
+    user = client.portal.call(server.db.users.find_one, {"username": "ali"})
+    assert user["total_score"] == 315
+
+
+def queued_games(user_id, scores):
+    now = datetime.now(timezone.utc).isoformat()
+    return [
+        {"_id": game_id, "id": game_id, "user_id": user_id, "mode": "Tek Kişilik - Kolay", "score": score,
+         "duration": 10, "date": now}
+        for game_id, score in ((str(uuid.uuid4()), score) for score in scores)
+    ]
+
+
+def fail_next_call(monkeypatch, module, name):
+    # The next module.name() call raises like a dropped connection; later ones go through
+    original = getattr(module, name)
+
+    async def fail_once(*args):
+        monkeypatch.setattr(module, name, original)
+        raise ConnectionError("connection reset")
+    monkeypatch.setattr(module, name, fail_once)
+
+
+def test_retried_flush_counts_games_once(server, client, monkeypatch):
+    headers = register(client, "ayse")
+    user_id = client.get("/api/user/me", headers=headers).json()["id"]
+    games = queued_games(user_id, (40, 60))
+
+    # First attempt fails after the users $inc
+    fail_next_call(monkeypatch, server.user_stats, "record_games")
+    with pytest.raises(ConnectionError):
+        client.portal.call(server.flush_game_saves, games)
+    client.portal.call(server.flush_game_saves, games)
+
+    user = client.portal.call(server.db.users.find_one, {"id": user_id})
+    stats = client.portal.call(server.db.user_stats.find_one, {"user_id": user_id})
+    assert user["total_score"] == 100
+    assert (stats["total_score"], stats["games_played"]) == (100, 2)
+    assert client.portal.call(server.db.games.count_documents, {"user_id": user_id}) == 2
+
+
+def test_retried_match_batch_counts_games_once(server, client, monkeypatch):
+    headers = register(client, "veli")
+    user_id = client.get("/api/user/me", headers=headers).json()["id"]
+    match = {
+        "_id": str(uuid.uuid4()), "room_code": "ABC123", "mode": server.ONLINE_MODE, "duration": 10,
+        "date": datetime.now(timezone.utc).isoformat(), "winner": "player1",
+        "players": [{"user_id": user_id, "username": "veli", "score": 7},
+                    {"user_id": None, "username": "guest", "score": 3}],
+    }
+
+    fail_next_call(monkeypatch, server.leaderboards, "record_games")
+    with pytest.raises(ConnectionError):
+        client.portal.call(server.flush_matches, [match])
+    client.portal.call(server.flush_matches, [match])
+
+    user = client.portal.call(server.db.users.find_one, {"id": user_id})
+    assert user["total_score"] == 7
+    assert client.portal.call(server.db.games.count_documents, {"match_id": match["_id"]}) == 1
+    assert client.get("/api/leaderboard", params={"period": "day"}).json()[0]["total_score"] == 7
+
+
+def test_replayed_sync_finishes_a_failed_apply(server, client, monkeypatch):
+    headers = register(client, "zeynep")
+    batch = {"games": [{"client_id": f"offline-{i}", "mode": "Tek Kişilik - Zor", "score": score, "duration": 10}
+                       for i, score in enumerate((20, 30))]}
+
+    fail_next_call(monkeypatch, server.user_stats, "record_games")
+    with pytest.raises(ConnectionError):
+        client.post("/api/game/sync", json=batch, headers=headers)
+
+    response = client.post("/api/game/sync", json=batch, headers=headers).json()
+    assert response["duplicates"] == ["offline-0", "offline-1"]
+    assert client.get("/api/user/me", headers=headers).json()["total_score"] == 50
+    assert client.get("/api/leaderboard").json()[0]["total_score"] == 50
+
+    response = client.post("/api/game/sync", json=batch, headers=headers).json()
+    assert response["duplicates"] == ["offline-0", "offline-1"]
+    assert client.get("/api/user/me", headers=headers).json()["total_score"] == 50
+
+
+def test_unknown_modes_get_no_boards_of_their_own(server, client):
+    headers = register(client, "mehmet")
+    for mode in ("Tek Kişilik - Zor", "uydurma mod"):
+        response = client.post("/api/game/save", json={"mode": mode, "score": 10, "duration": 7}, headers=headers)
+        assert response.status_code == 200
+
+    boards = client.portal.call(server.db.leaderboard_buckets.distinct, "board")
+    assert not [board for board in boards if "uydurma" in board]
+    assert client.get("/api/leaderboard", params={"period": "day"}).json()[0]["total_score"] == 20
+    assert client.get("/api/leaderboard", params={"mode": "Tek Kişilik - Zor"}).json()[0]["total_score"] == 10
+    assert client.get("/api/leaderboard", params={"mode": "uydurma mod"}).status_code == 400
+
+
+def test_reads_during_a_save_dont_double_count(server, client, monkeypatch):
+    headers = register(client, "can")
+    user_id = client.get("/api/user/me", headers=headers).json()["id"]
+
+    # A poll that misses the cache between the $inc and the end of the save
+    record_game = server.user_stats.record_game
+
+    async def read_midway(*args):
+        server.profile_cache.clear()
+        await server.load_profile(user_id)
+        await server.get_records(user_id=user_id)
+        return await record_game(*args)
+    monkeypatch.setattr(server.user_stats, "record_game", read_midway)
+
+    response = client.post("/api/game/save", json={"mode": "Tek Kişilik - Kolay", "score": 50, "duration": 15},
+                           headers=headers)
+    assert response.status_code == 200
+    assert client.get("/api/user/me", headers=headers).json()["total_score"] == 50
+    assert [record["score"] for record in client.get("/api/game/records", headers=headers).json()] == [50]
@@ -0,0 +1,77 @@
+import asyncio
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+motor_asyncio = pytest.importorskip("motor.motor_asyncio")
+
+MONGO_URL = os.environ.get("MONGO_URL")
+
+
+@pytest.mark.skipif(not MONGO_URL, reason="needs a running mongod (set MONGO_URL)")
+def test_every_endpoint_query_uses_an_index():
+    import migrations
+
+    async def check():
+        client = motor_asyncio.AsyncIOMotorClient(MONGO_URL, serverSelectionTimeoutMS=2000)
+        db = client[f"index_check_{uuid.uuid4().hex[:8]}"]
+        try:
+            await migrations.ensure_indexes(db)
+            return await migrations.verify(db)
+        finally:
+            await client.drop_database(db.name)
+            client.close()
+
+    assert asyncio.run(check()) == []
+
+
+def test_build_progress_asks_only_for_this_index_build(caplog):
+    import migrations
+
+    sent = []
+
+    class Admin:
+        async def command(self, command):
+            sent.append(command)
+            return {"inprog": [{"progress": {"done": 40, "total": 100}, "msg": "Index Build"}]}
+
+    class Client:
+        admin = Admin()
+
+    class Database:
+        name = "oyun"
+        client = Client()
+
+    async def report_once():
+        reporter = asyncio.create_task(migrations._report_build_progress(Database(), migrations.INDEXES[0], 0))
+        while not sent:
+            await asyncio.sleep(0)
+        reporter.cancel()
+
+    with caplog.at_level("INFO", logger="migrations"):
+        asyncio.run(report_once())
+    assert sent[0] == {"currentOp": 1, "ns": "oyun.users", "command.createIndexes": {"$exists": True}}
+    assert "Building users.email_1: 40/100" in caplog.text
+
+
+def test_register_race_is_a_400(server, client, monkeypatch):
+    # The unique indexes from the migrations are the last line of defence
+    client.portal.call(server.migrations.run, server.db)
+    account = {"username": "elif", "email": "elif@example.com", "password": "sifre123"}
+    assert client.post("/api/auth/register", json=account).status_code == 200
+
+    # Both checks pass, as when the other registration lands just after them
+    async def no_conflict_yet(user_data):
+        monkeypatch.setattr(server, "registration_conflict", registration_conflict)
+        return None
+    registration_conflict = server.registration_conflict
+    monkeypatch.setattr(server, "registration_conflict", no_conflict_yet)
+
+    response = client.post("/api/auth/register", json={**account, "username": "elif2"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Email zaten kayıtlı"
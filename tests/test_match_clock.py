@@ -0,0 +1,120 @@
+import asyncio
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from match_clock import TimerWheel  # noqa: E402
+
+RESOLUTION = 0.1
+
+
+async def never(key):
+    raise AssertionError("expire() doesn't call on_expire")
+
+
+def wheel(slots=8, on_expire=never):
+    # 8 slots of 0.1 s: one turn of the wheel is 0.8 s
+    return TimerWheel(on_expire, resolution=RESOLUTION, slots=slots, clock=lambda: 0.0)
+
+
+def test_fires_on_the_deadline_tick_not_before():
+    clock = wheel()
+    clock.schedule("R1", 0.5, now=0.0)
+    assert clock.expire(now=0.45) == []
+    assert "R1" in clock
+    assert clock.expire(now=0.5) == ["R1"]
+    assert len(clock) == 0
+
+
+def test_deadline_more_than_a_turn_ahead_waits_for_its_turn():
+    clock = wheel()
+    clock.schedule("R1", 2.05, now=0.0)
+    # Its slot comes round at 0.5 and 1.3 before the deadline
+    for now in (0.5, 0.8, 1.3, 1.6, 2.0):
+        assert clock.expire(now=now) == []
+    assert clock.expire(now=2.1) == ["R1"]
+
+
+def test_catches_up_after_a_stall_longer_than_a_turn():
+    clock = wheel()
+    clock.schedule("R1", 0.3, now=0.0)
+    clock.schedule("R2", 1.5, now=0.0)
+    clock.schedule("R3", 5.0, now=0.0)
+    assert sorted(clock.expire(now=3.0)) == ["R1", "R2"]
+    assert clock.expire(now=4.9) == []
+    assert clock.expire(now=5.0) == ["R3"]
+    assert clock.stats()["ticks"] == 50
+
+
+def test_cancel():
+    clock = wheel()
+    clock.schedule("R1", 0.5, now=0.0)
+    clock.schedule("R2", 0.5, now=0.0)
+    assert clock.cancel("R1")
+    assert not clock.cancel("R1")
+    assert clock.expire(now=1.0) == ["R2"]
+    assert (clock.cancelled, clock.fired) == (1, 1)
+
+
+def test_reschedule_replaces_the_deadline():
+    clock = wheel()
+    clock.schedule("R1", 0.5, now=0.0)
+    clock.schedule("R1", 3.0, now=0.0)
+    assert len(clock) == 1
+    assert clock.expire(now=2.9) == []
+    assert clock.expire(now=3.0) == ["R1"]
+    assert clock.cancelled == 0
+
+
+def test_past_deadline_fires_on_the_next_tick():
+    clock = wheel()
+    clock.expire(now=1.0)
+    clock.schedule("R1", -5.0, now=1.0)
+    assert clock.expire(now=1.0) == []
+    assert clock.expire(now=1.1) == ["R1"]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_never_early_and_at_most_a_tick_late(seed):
+    rng = random.Random(seed)
+    clock = wheel(slots=16)
+    deadlines = {}
+    fired = {}
+    now = previous = 0.0
+    for step in range(400):
+        if step < 200:
+            delay = rng.uniform(-0.5, 5)
+            clock.schedule(f"R{step}", delay, now=now)
+            deadlines[f"R{step}"] = (now, now + delay)
+        # Uneven ticks, now and then a stall of over a turn
+        now += rng.uniform(0, 3) if rng.random() < 0.02 else rng.uniform(0, 0.15)
+        for key in clock.expire(now=now):
+            fired[key] = (previous, now)
+        previous = now
+    clock.expire(now=now + 10)
+    assert len(clock) == 0
+    for key, (scheduled_at, deadline) in deadlines.items():
+        before, at = fired[key]
+        assert at >= deadline - 1e-9
+        # Not already overdue by a whole tick at the previous expire(); a
+        # deadline already past when scheduled is due a tick later
+        assert before < max(deadline, scheduled_at) + RESOLUTION + 1e-9
+
+
+def test_advance_hands_keys_to_on_expire_despite_failures():
+    expired = []
+
+    async def on_expire(key):
+        expired.append(key)
+        if key == "R1":
+            raise RuntimeError("room gone")
+
+    clock = wheel(on_expire=on_expire)
+    clock.schedule("R1", 0.1, now=0.0)
+    clock.schedule("R2", 0.1, now=0.0)
+    asyncio.run(clock.advance(now=0.2))
+    assert sorted(expired) == ["R1", "R2"]
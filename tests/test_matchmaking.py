@@ -0,0 +1,122 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from matchmaking import Matchmaker  # noqa: E402
+
+
+def matchmaker(**options):
+    matches = []
+
+    async def on_match(first, second):
+        matches.append((first.sid, second.sid))
+
+    return Matchmaker(on_match, **options), matches
+
+
+def enqueue(mm, sid, rating=0, now=0.0):
+    return asyncio.run(mm.enqueue(sid, sid.upper(), rating, now=now))
+
+
+def sids(pairs):
+    return [(first.sid, second.sid) for first, second in pairs]
+
+
+def test_same_band_pairs_on_enqueue():
+    mm, matches = matchmaker(band_width=100)
+    assert enqueue(mm, "a", 120) is None
+    assert enqueue(mm, "b", 180).sid == "a"
+    assert matches == [("a", "b")]
+    assert len(mm) == 0
+
+
+def test_adjacent_bands_pair_only_after_widen_after():
+    mm, _ = matchmaker(band_width=100, widen_after=5)
+    enqueue(mm, "a", 50, now=0.0)
+    enqueue(mm, "b", 150, now=1.0)
+
+    # b has only waited 4.9s
+    assert mm.pair(now=5.9) == []
+    assert "a" in mm and "b" in mm
+    assert sids(mm.pair(now=6.0)) == [("a", "b")]
+    assert mm.widened == 1
+    assert len(mm) == 0
+
+
+def test_each_further_band_waits_another_widen_after():
+    mm, _ = matchmaker(band_width=100, widen_after=5)
+    enqueue(mm, "a", 50, now=0.0)
+    enqueue(mm, "c", 250, now=0.0)
+
+    assert mm.pair(now=9.9) == []
+    assert sids(mm.pair(now=10.0)) == [("a", "c")]
+
+
+def test_widening_pairs_neighbours_not_the_whole_queue():
+    mm, _ = matchmaker(band_width=100, widen_after=5)
+    for sid, rating in (("a", 50), ("b", 150), ("c", 350)):
+        enqueue(mm, sid, rating, now=0.0)
+
+    assert sids(mm.pair(now=5.0)) == [("a", "b")]
+    assert "c" in mm
+
+
+def test_rate_cap_leaves_pairs_queued():
+    mm, matches = matchmaker(matches_per_second=1)
+    for sid in ("a", "b", "c", "d", "e", "f"):
+        enqueue(mm, sid, now=0.0)
+
+    # The one token went to a+b; the rest wait for refills
+    assert matches == [("a", "b")]
+    assert len(mm) == 4
+    assert mm.pair(now=0.5) == []
+    assert sids(mm.pair(now=1.0)) == [("c", "d")]
+    assert "e" in mm and "f" in mm
+    assert sids(mm.pair(now=2.0)) == [("e", "f")]
+    assert len(mm) == 0
+
+
+def test_rate_cap_also_holds_back_widened_pairs():
+    mm, matches = matchmaker(band_width=100, widen_after=5, matches_per_second=0.1)
+    enqueue(mm, "a", 50, now=0.0)
+    enqueue(mm, "b", 60, now=0.0)
+    enqueue(mm, "c", 150, now=0.0)
+    enqueue(mm, "d", 250, now=0.0)
+
+    # a+b took the only token; the next one is 10s away
+    assert matches == [("a", "b")]
+    assert mm.pair(now=5.0) == []
+    assert mm.widened == 0
+    assert sids(mm.pair(now=10.0)) == [("c", "d")]
+
+
+def test_tick_hands_pairs_to_on_match():
+    mm, matches = matchmaker(band_width=100, widen_after=5)
+    enqueue(mm, "a", 50, now=0.0)
+    enqueue(mm, "b", 150, now=0.0)
+
+    asyncio.run(mm.tick(now=5.0))
+    assert matches == [("a", "b")]
+
+
+def test_cancel_removes_the_ticket():
+    mm, matches = matchmaker()
+    enqueue(mm, "a")
+    assert mm.cancel("a")
+    assert "a" not in mm and len(mm) == 0
+    assert not mm.cancel("a")
+    assert mm.stats()["cancelled"] == 1
+
+    # Nobody left to pair with
+    assert enqueue(mm, "b") is None
+    assert matches == []
+
+
+def test_enqueue_again_replaces_the_ticket():
+    mm, _ = matchmaker(band_width=100)
+    enqueue(mm, "a", 50)
+    enqueue(mm, "a", 250)
+    assert len(mm) == 1
+    assert mm.pair(now=0.0) == []
@@ -0,0 +1,67 @@
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import metrics  # noqa: E402
+
+THREADS = 4
+PER_THREAD = 5000
+
+
+def test_recording_from_threads_while_rendering():
+    # MongoCommandTimer records from pymongo's threads while /metrics renders
+    registry = metrics.MetricsRegistry()
+    histogram = registry.histogram("test_duration_seconds", "test", ("command",))
+    counter = registry.counter("test_failures_total", "test", ("command",))
+    done = threading.Event()
+    errors = []
+
+    def record(worker):
+        for i in range(PER_THREAD):
+            # A new label now and then, like a first-seen command name
+            command = f"cmd{worker}_{i % 50}"
+            histogram.labels(command).observe(0.001)
+            counter.inc(command)
+
+    def render():
+        try:
+            while not done.is_set():
+                registry.render()
+        except Exception as error:
+            errors.append(error)
+
+    renderer = threading.Thread(target=render)
+    renderer.start()
+    workers = [threading.Thread(target=record, args=(worker,)) for worker in range(THREADS)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    done.set()
+    renderer.join()
+
+    assert errors == []
+    lines = registry.render().splitlines()
+    counts = [line for line in lines if line.startswith("test_duration_seconds_count")]
+    assert len(counts) == THREADS * 50
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in counts) == THREADS * PER_THREAD
+    failures = [line for line in lines if line.startswith("test_failures_total")]
+    assert sum(float(line.rsplit(" ", 1)[1]) for line in failures) == THREADS * PER_THREAD
+
+
+def test_render_format():
+    registry = metrics.MetricsRegistry()
+    histogram = registry.histogram("op_seconds", "Op latency", ("op",), buckets=(0.1, 1.0))
+    histogram.labels("find").observe(0.05)
+    histogram.labels("find").observe(0.5)
+    assert registry.render().splitlines() == [
+        "# HELP op_seconds Op latency",
+        "# TYPE op_seconds histogram",
+        'op_seconds_bucket{op="find",le="0.1"} 1',
+        'op_seconds_bucket{op="find",le="1.0"} 2',
+        'op_seconds_bucket{op="find",le="+Inf"} 2',
+        'op_seconds_sum{op="find"} 0.55',
+        'op_seconds_count{op="find"} 2',
+    ]
@@ -0,0 +1,123 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+import rankings  # noqa: E402
+from rankings import RankIndex  # noqa: E402
+
+
+def stats(user_id, total_score, username=None):
+    return {"user_id": user_id, "username": username or user_id.upper(), "total_score": total_score,
+            "best_score": total_score, "games_played": 1}
+
+
+@pytest.fixture
+def collection():
+    return mongomock_motor.AsyncMongoMockClient()["test"].user_stats
+
+
+def run(scenario):
+    asyncio.run(scenario())
+
+
+def ranks(index):
+    return {user_id: index.rank(user_id) for user_id in index._players}
+
+
+def test_refresh_applies_changes_and_removals(collection):
+    index = RankIndex(lambda: collection)
+
+    async def scenario():
+        await collection.insert_many([stats("a", 30), stats("b", 20), stats("c", 10)])
+        await index.load()
+        assert ranks(index) == {"a": 1, "b": 2, "c": 3}
+
+        await collection.update_one({"user_id": "c"}, {"$set": {"total_score": 40}})
+        await collection.delete_one({"user_id": "b"})
+        await index.load()
+        assert ranks(index) == {"c": 1, "a": 2}
+        assert index.last_changes == 2
+        assert "b" not in index and "b" not in index._seen
+
+        # Nothing changed: nothing re-keyed
+        await index.load()
+        assert index.last_changes == 0
+    run(scenario)
+
+
+def test_refresh_keeps_players_added_since_the_last_load(collection):
+    index = RankIndex(lambda: collection)
+
+    async def scenario():
+        await collection.insert_many([stats("a", 30)])
+        await index.load()
+        # Registered on another worker after the load, read through ensure
+        await collection.insert_one(stats("b", 20))
+        assert await index.ensure("b")
+        await collection.delete_one({"user_id": "a"})
+
+        await index.load()
+        assert "a" not in index
+        assert index.rank("b") == 1
+    run(scenario)
+
+
+def test_refresh_removes_across_slices(collection, monkeypatch):
+    monkeypatch.setattr(rankings, "REFRESH_SLICE", 3)
+    index = RankIndex(lambda: collection)
+
+    async def scenario():
+        await collection.insert_many([stats(f"u{i:02}", i) for i in range(10)])
+        await index.load()
+        await collection.delete_many({"user_id": {"$in": [f"u{i:02}" for i in range(0, 10, 2)]}})
+        await index.load()
+        assert sorted(index._players) == [f"u{i:02}" for i in range(1, 10, 2)]
+        assert len(index._order) == len(index) == 5
+        assert index.rank("u09") == 1 and index.rank("u01") == 5
+    run(scenario)
+
+
+def test_ties_share_a_rank(collection):
+    index = RankIndex(lambda: collection)
+
+    async def scenario():
+        await collection.insert_many([stats("a", 30), stats("b", 20), stats("c", 20), stats("d", 10)])
+        await index.load()
+        assert ranks(index) == {"a": 1, "b": 2, "c": 2, "d": 4}
+        assert index.rank_of_score(20) == 2
+        assert index.rank_of_score(25) == 2
+        assert index.rank_of_score(5) == 5
+        assert [entry["rank"] for entry in index.around("d", 3)["above"]] == [1, 2, 2]
+    run(scenario)
+
+
+def test_around_at_the_edges(collection):
+    index = RankIndex(lambda: collection)
+
+    async def scenario():
+        await collection.insert_many([stats(user_id, score) for user_id, score in
+                                      (("a", 50), ("b", 40), ("c", 30), ("d", 20), ("e", 10))])
+        await index.load()
+
+        top = index.around("a", 2)
+        assert top["me"]["rank"] == 1
+        assert top["above"] == []
+        assert [entry["username"] for entry in top["below"]] == ["B", "C"]
+
+        bottom = index.around("e", 2)
+        assert [entry["username"] for entry in bottom["above"]] == ["C", "D"]
+        assert bottom["below"] == []
+
+        # k larger than the list
+        middle = index.around("c", 10)
+        assert len(middle["above"]) == 2 and len(middle["below"]) == 2
+        assert middle["total_players"] == 5
+
+        assert index.around("missing", 2) is None
+    run(scenario)
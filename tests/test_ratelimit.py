@@ -0,0 +1,96 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import metrics  # noqa: E402
+from ratelimit import EventRateLimiter, parse_limits  # noqa: E402
+
+
+def test_parse_limits():
+    assert parse_limits("player_hit=50/100, create_room=1,bad=x,nothing") == {
+        "player_hit": (50.0, 100.0),
+        "create_room": (1.0, 1.0),
+    }
+
+
+def test_burst_then_refill():
+    limiter = EventRateLimiter({"hit": (2, 3)})
+    assert [limiter.allow("s", "hit", now=0.0) for _ in range(4)] == [True, True, True, False]
+
+    # 2 per second: one token back after half a second, none extra before
+    assert not limiter.allow("s", "hit", now=0.4)
+    assert limiter.allow("s", "hit", now=0.5)
+    assert not limiter.allow("s", "hit", now=0.5)
+
+
+def test_refill_stops_at_the_burst():
+    limiter = EventRateLimiter({"hit": (2, 3)})
+    limiter.allow("s", "hit", now=0.0)
+    allowed = [limiter.allow("s", "hit", now=100.0) for _ in range(4)]
+    assert allowed == [True, True, True, False]
+    assert limiter.stats()["allowed"] == {"hit": 4}
+    assert limiter.stats()["dropped"] == {"hit": 1}
+
+
+def test_buckets_are_per_sid_and_event():
+    limiter = EventRateLimiter({"hit": (1, 1), "join": (1, 1)})
+    assert limiter.allow("a", "hit", now=0.0)
+    assert not limiter.allow("a", "hit", now=0.0)
+    assert limiter.allow("a", "join", now=0.0)
+    assert limiter.allow("b", "hit", now=0.0)
+
+
+def test_rate_zero_removes_the_limit():
+    limiter = EventRateLimiter(parse_limits("hit=5/5") | parse_limits("hit=0"))
+    assert "hit" not in limiter.limits
+    assert all(limiter.allow("s", "hit", now=0.0) for _ in range(100))
+    assert limiter.stats()["sids"] == 0
+
+
+def test_forget_drops_the_sids_buckets():
+    limiter = EventRateLimiter({"hit": (1, 1)})
+    limiter.allow("s", "hit", now=0.0)
+    assert not limiter.allow("s", "hit", now=0.0)
+
+    limiter.forget("s")
+    assert limiter.stats()["sids"] == 0
+    # A fresh bucket starts full
+    assert limiter.allow("s", "hit", now=0.0)
+    limiter.forget("unknown")
+
+
+class FakeServer:
+    def __init__(self, handlers):
+        self.handlers = {"/": dict(handlers)}
+
+
+def test_install_wraps_handlers_after_instrumenting():
+    calls = []
+
+    async def rate_limit_test_hit(sid, data):
+        calls.append((sid, data))
+        return "ok"
+
+    async def rate_limit_test_other(sid, data):
+        return "other"
+
+    sio = FakeServer({"rate_limit_test_hit": rate_limit_test_hit, "rate_limit_test_other": rate_limit_test_other})
+    metrics.instrument_socketio(sio)
+    timed = sio.handlers["/"]["rate_limit_test_hit"]
+    untouched = sio.handlers["/"]["rate_limit_test_other"]
+
+    limiter = EventRateLimiter({"rate_limit_test_hit": (1, 1)}, clock=lambda: 0.0)
+    limiter.install(sio)
+    limited = sio.handlers["/"]["rate_limit_test_hit"]
+    assert limited is not timed and limited.__wrapped__ is timed
+    assert sio.handlers["/"]["rate_limit_test_other"] is untouched
+
+    histogram = metrics.socketio_event_duration.labels("rate_limit_test_hit")
+    assert asyncio.run(limited("s", 1)) == "ok"
+    # Dropped before the latency histogram and the handler see it
+    assert asyncio.run(limited("s", 2)) is None
+    assert calls == [("s", 1)]
+    assert histogram.count == 1
+    assert limiter.stats()["dropped"] == {"rate_limit_test_hit": 1}
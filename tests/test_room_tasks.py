@@ -0,0 +1,48 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from rooms import WAITING, RoomReaper, RoomRegistry  # noqa: E402
+from score_ticker import ScoreTicker  # noqa: E402
+
+
+def test_reaper_notifies_every_room_when_one_fails():
+    registry = RoomRegistry()
+    rooms = [registry.create(f"sid{i}", f"Oyuncu {i}") for i in range(3)]
+    notified = []
+
+    async def on_evict(room):
+        if room is rooms[0]:
+            raise ConnectionError("directory unavailable")
+        notified.append(room.code)
+
+    reaper = RoomReaper(registry, ttls={WAITING: 60}, interval=1, on_evict=on_evict)
+    expired = reaper.sweep(now=rooms[-1].state_since + 60)
+    asyncio.run(reaper.notify(expired))
+
+    assert len(registry) == 0
+    assert notified == [room.code for room in rooms[1:]]
+
+
+def test_ticker_flushes_every_room_when_one_fails():
+    registry = RoomRegistry()
+    rooms = [registry.create(f"sid{i}", f"Oyuncu {i}") for i in range(3)]
+    flushed = []
+
+    async def flush(room):
+        if room is rooms[0]:
+            raise ConnectionError("emit failed")
+        flushed.append(room.code)
+
+    async def tick():
+        ticker = ScoreTicker(hz=10, flush=flush)
+        for room in rooms:
+            await ticker.mark(room)
+        await ticker.tick()
+        return ticker
+
+    ticker = asyncio.run(tick())
+    assert flushed == [room.code for room in rooms[1:]]
+    assert ticker.stats()["pending_rooms"] == 0